@@ -0,0 +1,59 @@
+from collections import defaultdict
+from revenue import order_revenue, category_breakdown
+
+
+class Aggregates:
+    def __init__(self):
+        self.revenue = defaultdict(float)
+        self.completed_orders = 0
+        self.occupied_tables = 0
+
+    def rebuild(self, menu, orders, tables, revenue=None, completed=None):
+        if revenue is None:
+            revenue = category_breakdown(orders, menu)
+        if completed is None:
+            completed = sum(1 for order in orders if order.status == "Completed")
+        self.revenue = defaultdict(float, revenue)
+        self.completed_orders = completed
+        self.recount_tables(tables)
+
+    def recount_tables(self, tables):
+        self.occupied_tables = sum(1 for data in tables.values() if data["occupied"])
+
+    def _add_order(self, order, menu, sign):
+        for category, amount in order_revenue(order, menu).items():
+            self.revenue[category] += sign * amount
+            if abs(self.revenue[category]) < 0.005:
+                del self.revenue[category]
+        self.completed_orders += sign
+
+    def order_status_changed(self, order, old_status, menu):
+        if old_status == order.status:
+            return
+        if order.status == "Completed":
+            self._add_order(order, menu, 1)
+        elif old_status == "Completed":
+            self._add_order(order, menu, -1)
+
+    def order_removed(self, order, menu):
+        if order.status == "Completed":
+            self._add_order(order, menu, -1)
+
+    def table_changed(self, was_occupied, occupied):
+        self.occupied_tables += int(bool(occupied)) - int(bool(was_occupied))
+
+    def total_revenue(self):
+        return sum(self.revenue.values())
+
+    def verify(self, menu, orders, tables):
+        fresh = Aggregates()
+        fresh.rebuild(menu, orders, tables)
+        problems = []
+        for category in set(self.revenue) | set(fresh.revenue):
+            if round(self.revenue.get(category, 0.0), 2) != round(fresh.revenue.get(category, 0.0), 2):
+                problems.append(f"revenue[{category}]: {self.revenue.get(category, 0.0):.2f} != {fresh.revenue.get(category, 0.0):.2f}")
+        if self.completed_orders != fresh.completed_orders:
+            problems.append(f"completed_orders: {self.completed_orders} != {fresh.completed_orders}")
+        if self.occupied_tables != fresh.occupied_tables:
+            problems.append(f"occupied_tables: {self.occupied_tables} != {fresh.occupied_tables}")
+        return problems
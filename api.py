@@ -0,0 +1,263 @@
+from flask import Blueprint, abort, jsonify, request
+from werkzeug.exceptions import HTTPException
+from etags import conditional, version_etag
+from exports import menu_records, table_records, order_records
+from utils import menu_snapshot, tables_snapshot, edit_menu_items, edit_tables, save_tables, submit_order, change_order_statuses, delete_order, get_order, filter_orders, page_orders
+from utils import kitchen, next_ticket, set_ticket_state, ticket_states, order_statuses, search_menu
+
+# JSON endpoints for menu, tables, orders and the kitchen queue. The batch
+# endpoints apply a list of changes under one lock and one save, so a client
+# updating many items pays for one write instead of one per item.
+api = Blueprint("api", __name__, url_prefix="/api")
+
+# Largest batch and page a single request may ask for
+max_batch = 500
+max_page = 500
+
+
+@api.errorhandler(HTTPException)
+def json_error(error):
+    return jsonify(error=error.description), error.code
+
+
+def _payload(kind=dict):
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, kind):
+        abort(400, f"Expected a JSON {'object' if kind is dict else 'array'}")
+    if kind is list and len(payload) > max_batch:
+        abort(400, f"At most {max_batch} changes per batch")
+    return payload
+
+
+def _field(data, key, kind, required=False):
+    value = data.get(key)
+    if value is None:
+        if required:
+            abort(400, f"Missing field: {key}")
+        return None
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        abort(400, f"Field {key} must be {kind.__name__}")
+    return value
+
+
+def _menu_edit(data, name=None):
+    if not isinstance(data, dict):
+        abort(400, "Each change must be a JSON object")
+    return {
+        "name": name or _field(data, "name", str, required=True),
+        "category": _field(data, "category", str),
+        "price": _field(data, "price", float),
+        "available": _field(data, "available", bool),
+        "delete": _field(data, "delete", bool),
+    }
+
+
+def _table_edit(data, table_id=None):
+    if not isinstance(data, dict):
+        abort(400, "Each change must be a JSON object")
+    return {
+        "table_id": table_id or _field(data, "table_id", str, required=True),
+        "seats": _field(data, "seats", int),
+        "occupied": _field(data, "occupied", bool),
+        "delete": _field(data, "delete", bool),
+    }
+
+
+def _status_update(data, order_id=None):
+    if not isinstance(data, dict):
+        abort(400, "Each change must be a JSON object")
+    order_id = order_id or _field(data, "order_id", str, required=True)
+    status = _field(data, "status", str, required=True)
+    if status not in order_statuses:
+        abort(400, f"Status must be one of: {', '.join(order_statuses)}")
+    return (order_id, status)
+
+
+def _record(records, key, value):
+    for record in records:
+        if record[key] == value:
+            return record
+    return None
+
+
+# -------------------------
+# Menu
+# -------------------------
+@api.route("/menu")
+def list_menu():
+    return conditional(version_etag(["menu"]), lambda: jsonify(list(menu_records(menu_snapshot()))))
+
+@api.route("/menu/search")
+def menu_typeahead():
+    # Best matches among available items for ?q=, at most ?limit= of them
+    limit = min(request.args.get("limit", 10, type=int), max_page)
+    return jsonify(search_menu(request.args.get("q", ""), limit))
+
+@api.route("/menu", methods=["POST"])
+def create_menu_item():
+    edit = _menu_edit(_payload())
+    if edit["category"] is None or edit["price"] is None:
+        abort(400, "A new menu item needs a category and a price")
+    edit_menu_items([edit])
+    return jsonify(_record(menu_records(menu_snapshot()), "name", edit["name"])), 201
+
+@api.route("/menu/<name>")
+def show_menu_item(name):
+    def respond():
+        record = _record(menu_records(menu_snapshot()), "name", name)
+        if record is None:
+            abort(404, f"Unknown menu item: {name}")
+        return jsonify(record)
+    return conditional(version_etag(["menu"], name), respond)
+
+@api.route("/menu/<name>", methods=["PATCH", "PUT"])
+def edit_menu_item(name):
+    if not edit_menu_items([_menu_edit(_payload(), name)])[0]:
+        abort(404, f"Unknown menu item: {name}")
+    return jsonify(_record(menu_records(menu_snapshot()), "name", name))
+
+@api.route("/menu/<name>", methods=["DELETE"])
+def remove_menu_item(name):
+    if not edit_menu_items([{"name": name, "delete": True}])[0]:
+        abort(404, f"Unknown menu item: {name}")
+    return "", 204
+
+@api.route("/menu/batch", methods=["POST"])
+def batch_menu():
+    edits = [_menu_edit(data) for data in _payload(list)]
+    results = edit_menu_items(edits)
+    return jsonify([{"name": edit["name"], "ok": ok} for edit, ok in zip(edits, results)])
+
+
+# -------------------------
+# Tables
+# -------------------------
+def _edit_tables(edits):
+    results = edit_tables(edits)
+    save_tables()
+    return results
+
+@api.route("/tables")
+def list_tables():
+    return conditional(version_etag(["tables"]), lambda: jsonify(list(table_records(tables_snapshot()))))
+
+@api.route("/tables", methods=["POST"])
+def create_table():
+    edit = _table_edit(_payload())
+    if edit["seats"] is None:
+        abort(400, "A new table needs seats")
+    _edit_tables([edit])
+    return jsonify(_record(table_records(tables_snapshot()), "table_id", edit["table_id"])), 201
+
+@api.route("/tables/<table_id>")
+def show_table(table_id):
+    def respond():
+        record = _record(table_records(tables_snapshot()), "table_id", table_id)
+        if record is None:
+            abort(404, f"Unknown table: {table_id}")
+        return jsonify(record)
+    return conditional(version_etag(["tables"], table_id), respond)
+
+@api.route("/tables/<table_id>", methods=["PATCH", "PUT"])
+def edit_table(table_id):
+    if not _edit_tables([_table_edit(_payload(), table_id)])[0]:
+        abort(404, f"Unknown table: {table_id}")
+    return jsonify(_record(table_records(tables_snapshot()), "table_id", table_id))
+
+@api.route("/tables/<table_id>", methods=["DELETE"])
+def remove_table(table_id):
+    if not _edit_tables([{"table_id": table_id, "delete": True}])[0]:
+        abort(404, f"Unknown table: {table_id}")
+    return "", 204
+
+@api.route("/tables/batch", methods=["POST"])
+def batch_tables():
+    edits = [_table_edit(data) for data in _payload(list)]
+    results = _edit_tables(edits)
+    return jsonify([{"table_id": edit["table_id"], "ok": ok} for edit, ok in zip(edits, results)])
+
+
+# -------------------------
+# Orders
+# -------------------------
+@api.route("/orders")
+def list_orders():
+    # Same filters and cursors as the orders page, newest first
+    def respond():
+        filtered_orders = filter_orders(request.args.get("status"), request.args.get("date"), request.args.get("date_to"))
+        size = min(request.args.get("size", 50, type=int), max_page)
+        page, older, newer = page_orders(filtered_orders, request.args.get("before"), request.args.get("after"), size)
+        return jsonify(orders=list(order_records(page)), older=older, newer=newer)
+    return conditional(version_etag(["orders"], request.query_string), respond)
+
+@api.route("/orders", methods=["POST"])
+def create_order():
+    data = _payload()
+    table_id = _field(data, "table_id", str, required=True)
+    items = _field(data, "items", dict, required=True)
+    if not all(isinstance(qty, int) and not isinstance(qty, bool) and qty > 0 for qty in items.values()):
+        abort(400, "Item quantities must be positive integers")
+    order, message = submit_order(table_id, _field(data, "customer_name", str) or "", items)
+    if order is None:
+        abort(400, message.removeprefix("Error: "))
+    return jsonify(next(order_records([order]))), 201
+
+@api.route("/orders/<order_id>")
+def show_order(order_id):
+    def respond():
+        order = get_order(order_id)
+        if order is None:
+            abort(404, f"Unknown order: {order_id}")
+        return jsonify(next(order_records([order])))
+    return conditional(version_etag(["orders"], order_id), respond)
+
+@api.route("/orders/<order_id>", methods=["PATCH", "PUT"])
+def edit_order(order_id):
+    order = change_order_statuses([_status_update(_payload(), order_id)])[0]
+    if order is None:
+        abort(404, f"Unknown order: {order_id}")
+    return jsonify(next(order_records([order])))
+
+@api.route("/orders/<order_id>", methods=["DELETE"])
+def remove_order(order_id):
+    if delete_order(order_id) is None:
+        abort(404, f"Unknown order: {order_id}")
+    return "", 204
+
+@api.route("/orders/batch", methods=["POST"])
+def batch_orders():
+    updates = [_status_update(data) for data in _payload(list)]
+    orders = change_order_statuses(updates)
+    return jsonify([{"order_id": order_id, "ok": order is not None} for (order_id, _), order in zip(updates, orders)])
+
+
+# -------------------------
+# Kitchen
+# -------------------------
+@api.route("/kitchen")
+def list_stations():
+    return jsonify({station: kitchen.board(station) for station in kitchen.stations()})
+
+@api.route("/kitchen/<station>")
+def show_station(station):
+    return jsonify(kitchen.board(station))
+
+@api.route("/kitchen/<station>/next", methods=["POST"])
+def take_ticket(station):
+    # Starts the station's oldest queued ticket; 204 when there is none
+    ticket = next_ticket(station)
+    if ticket is None:
+        return "", 204
+    return jsonify(ticket.record())
+
+@api.route("/kitchen/tickets/<ticket_id>", methods=["PATCH", "PUT"])
+def edit_ticket(ticket_id):
+    state = _field(_payload(), "state", str, required=True)
+    if state not in ticket_states:
+        abort(400, f"State must be one of: {', '.join(ticket_states)}")
+    ticket = set_ticket_state(ticket_id, state)
+    if ticket is None:
+        abort(404, f"Unknown ticket: {ticket_id}")
+    return jsonify(ticket.record())
@@ -1,8 +1,13 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, Response, abort, render_template, request, stream_with_context
 from jinja2 import DictLoader
-from utils import load_menu, load_orders, load_tables, save_menu, save_orders, save_tables, generate_order_id, menu, orders, tables
+from exports import export_response, menu_records, table_records, order_records
+from utils import sync_changes, shared, save_tables, add_menu_item, update_menu_item, delete_menu_item, menu_snapshot, tables_snapshot, submit_order, change_order_status, add_table, delete_table, toggle_table, order_statuses, filter_orders, filtered_revenue, page_orders, aggregates, menu, all_orders, tables
 from templates import base_template, home_template, menu_template, tables_template, order_template, orders_template
-from collections import defaultdict
+from templates import menu_cards_template, table_cards_template, table_options_template
+from fragments import fragment_cache
+from etags import conditional, version_etag
+from api import api
+from feed import feed
 from datetime import datetime
 
 app = Flask(__name__)
@@ -15,22 +20,25 @@ app.jinja_loader = DictLoader({
     "tables.html": tables_template,
     "order.html": order_template,
     "orders.html": orders_template,
+    "menu_cards.html": menu_cards_template,
+    "table_cards.html": table_cards_template,
+    "table_options.html": table_options_template,
 })
 
+# Other worker processes may have changed the store since the last request
+app.before_request(sync_changes)
+app.register_blueprint(api)
+
 # Routes
 @app.route("/")
 def home():
-    sales_summary = defaultdict(float)
-    for o in orders:
-        if o[5] == "Completed":
-            sales_summary[menu[list(o[3].keys())[0]]["category"] if o[3] else "Unknown"] += o[2]
-    labels = list(sales_summary.keys())
-    data = list(sales_summary.values())
+    labels = list(aggregates.revenue.keys())
+    data = list(aggregates.revenue.values())
     num_items = len(menu)
-    total_orders = len([o for o in orders if o[5] == "Completed"])
+    total_orders = aggregates.completed_orders
     total_revenue = sum(data)
     total_tables = len(tables)
-    occupied_tables = sum(1 for t in tables.values() if t["occupied"])
+    occupied_tables = aggregates.occupied_tables
     return render_template("home.html", num_items=num_items, total_orders=total_orders, total_revenue=total_revenue, occupied_tables=occupied_tables, total_tables=total_tables, labels=labels, data=data)
 
 @app.route("/menu", methods=["GET", "POST"])
@@ -38,46 +46,42 @@ def manage_menu():
     if request.method == "POST":
         action = request.form.get("action")
         if action == "delete":
-            name = request.form["name"]
-            if name in menu:
-                del menu[name]
-                save_menu()
+            delete_menu_item(request.form["name"])
         elif action == "update":
             name = request.form["name"]
             price = float(request.form["price"])
             available = request.form.get("available") == "on"
-            if name in menu:
-                menu[name].update({"price": price, "available": available})
-                save_menu()
+            update_menu_item(name, price, available)
         else:
             name = request.form["name"]
             category = request.form["category"]
             price = float(request.form["price"])
             available = request.form.get("available") == "on"
-            menu[name] = {"category": category, "price": price, "available": available}
-            save_menu()
-    return render_template("menu.html", menu=menu)
+            add_menu_item(name, category, price, available)
+    def page():
+        menu_cards = fragment_cache.render("menu_cards.html", ["menu"], menu=menu_snapshot)
+        return render_template("menu.html", menu_cards=menu_cards)
+    return conditional(version_etag(["menu"]), page)
 
 @app.route("/tables", methods=["GET", "POST"])
 def manage_tables():
     if request.method == "POST":
         action = request.form.get("action")
         if action == "delete":
-            table_id = request.form["table_id"]
-            if table_id in tables:
-                del tables[table_id]
+            if delete_table(request.form["table_id"]):
                 save_tables()
         elif action == "toggle":
-            table_id = request.form["table_id"]
-            if table_id in tables:
-                tables[table_id]["occupied"] = not tables[table_id]["occupied"]
+            if toggle_table(request.form["table_id"]):
                 save_tables()
         else:
             table_id = request.form["table_id"]
             seats = int(request.form["seats"])
-            tables[table_id] = {"seats": seats, "occupied": False}
+            add_table(table_id, seats)
             save_tables()
-    return render_template("tables.html", tables=tables)
+    def page():
+        table_cards = fragment_cache.render("table_cards.html", ["tables"], tables=tables_snapshot)
+        return render_template("tables.html", table_cards=table_cards)
+    return conditional(version_etag(["tables"]), page)
 
 @app.route("/order", methods=["GET", "POST"])
 def place_order():
@@ -91,67 +95,70 @@ def place_order():
             if key.startswith("items[") and key.endswith("[name]"):
                 idx = key.split("[")[1].split("]")[0]
                 qty_key = f"items[{idx}][quantity]"
-                item_name = value
-                item_qty = int(request.form.get(qty_key, 1))
-                if item_name in menu and menu[item_name]["available"]:
-                    items[item_name] = item_qty
-        if not items:
-            message = "Error: No valid items selected."
-        elif table_id not in tables:
-            message = "Error: Invalid table ID."
-        else:
-            total = sum(menu[name]["price"] * qty for name, qty in items.items())
-            order_id = generate_order_id()
-            orders.append([order_id, table_id, total, items, customer_name, "Pending"])
-            if not tables[table_id]["occupied"]:
-                tables[table_id]["occupied"] = True
-            save_orders()
-            save_tables()
-            message = f"Order {order_id} placed for Table {table_id}. Total: ${total:.2f}"
-    return render_template("order.html", menu=menu, tables=tables, message=message)
+                items[value] = int(request.form.get(qty_key, 1))
+        order, message = submit_order(table_id, customer_name, items)
+        if order:
+            message = f"Order {order.order_id} placed for Table {table_id}. Total: ${order.total:.2f}"
+    return render_template(
+        "order.html",
+        table_options=fragment_cache.render("table_options.html", ["tables"], tables=tables_snapshot),
+        message=message,
+    )
 
 @app.route("/orders", methods=["GET", "POST"])
 def view_orders():
-    filtered_orders = orders
-    if request.method == "GET" and (request.args.get("status") or request.args.get("date")):
-        status = request.args.get("status")
-        date = request.args.get("date")
-        filtered_orders = [
-            o for o in orders
-            if (not status or o[5] == status) and
-               (not date or o[0].startswith(date.replace("-", "")))
-        ]
-    elif request.method == "POST":
+    if request.method == "POST":
         action = request.form.get("action")
         if action == "update_status":
-            order_id = request.form["order_id"]
-            new_status = request.form["status"]
-            for order in orders:
-                if order[0] == order_id:
-                    order[5] = new_status
-                    if new_status == "Completed" and order[1] in tables:
-                        tables[order[1]]["occupied"] = False
-                    save_orders()
-                    save_tables()
-                    break
-    total = sum(o[2] for o in filtered_orders if o[5] == "Completed")
-    return render_template("orders.html", orders=filtered_orders, total=total)
+            if request.form["status"] not in order_statuses:
+                abort(400)
+            change_order_status(request.form["order_id"], request.form["status"])
+
+    def listing():
+        filtered_orders = all_orders
+        if request.method == "GET":
+            filtered_orders = filter_orders(request.args.get("status"), request.args.get("date"), request.args.get("date_to"))
+        filters = {key: request.args[key] for key in ("status", "date", "date_to") if request.args.get(key)}
+        if request.args.get("stream"):
+            # Render every matching order without building the page in memory
+            template = app.jinja_env.get_template("orders.html")
+            rows = template.generate(orders=reversed(filtered_orders), total=None, filters=filters, older=None, newer=None)
+            return Response(stream_with_context(rows), mimetype="text/html")
+        size = min(request.args.get("size", 50, type=int), 500)
+        page, older, newer = page_orders(filtered_orders, request.args.get("before"), request.args.get("after"), size)
+        if filtered_orders is all_orders:
+            total = aggregates.total_revenue()
+        else:
+            total = filtered_revenue(request.args.get("status"), request.args.get("date"), request.args.get("date_to"))
+        return render_template("orders.html", orders=page, total=total, filters=filters, older=older, newer=newer)
+    return conditional(version_etag(["orders"], request.query_string), listing)
+
+@app.route("/events")
+def live_events():
+    # Live feed for kitchen and floor displays. EventSource sends back the
+    # last id it saw when it reconnects; other clients can pass ?last_id=.
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id") or feed.last_id()
+    events = feed.stream(last_id, refresh=sync_changes if shared else None)
+    return Response(events, mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route("/export/menu")
 def export_menu():
-    return send_file("menu.csv", as_attachment=True)
+    return conditional(version_etag(["menu"], request.query_string),
+                       lambda: export_response("menu", menu_records(menu_snapshot()), request.args.get("format", "csv")))
 
 @app.route("/export/tables")
 def export_tables():
-    return send_file("tables.csv", as_attachment=True)
+    return conditional(version_etag(["tables"], request.query_string),
+                       lambda: export_response("tables", table_records(tables_snapshot()), request.args.get("format", "csv")))
 
 @app.route("/export/orders")
 def export_orders():
-    return send_file("orders.csv", as_attachment=True)
+    def export():
+        filtered_orders = filter_orders(request.args.get("status"), request.args.get("date"), request.args.get("date_to"))
+        return export_response("orders", order_records(filtered_orders), request.args.get("format", "csv"))
+    return conditional(version_etag(["orders"], request.query_string), export)
 
 # Startup
 if __name__ == "__main__":
-    load_menu()
-    load_orders()
-    load_tables()
-    app.run(debug=True)
\ No newline at end of file
+    from asgi import serve
+    serve(app)
\ No newline at end of file
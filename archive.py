@@ -0,0 +1,555 @@
+import csv
+import json
+import marshal
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, timedelta
+from itertools import groupby
+from models import Order, make_cursor, split_cursor
+from persistence import atomic_write
+from revenue import summarize
+
+# Record layout: header, order id, created_at, status, then the marshalled
+# field tuple. A record with an empty body deletes the order, and a later
+# record for the same order replaces the earlier one.
+header = struct.Struct("<IBBB")
+fields = Order.__slots__
+
+
+def _next_day(day):
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+def bisect_cursor(orders, cursor, right=False):
+    lo, hi = 0, len(orders)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        key = orders[mid].cursor()
+        if key < cursor or (right and key == cursor):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class OrderArchive:
+    # Archived orders appended to one file and read through mmap. Memory
+    # holds only the offset and a status code of each live record, in cursor
+    # order; records are decoded when a query actually reaches them.
+    def __init__(self, path, repair=False):
+        self.path = path
+        self.offsets = array("Q")
+        self.status = array("B")
+        self.statuses = []
+        self._status_codes = {}
+        self._map = None
+        self._open(repair)
+
+    def _open(self, repair):
+        self._remap()
+        latest = {}
+        offset = 0
+        size = len(self._map) if self._map is not None else 0
+        while offset + header.size <= size:
+            body_len, id_len, created_len, status_len = header.unpack_from(self._map, offset)
+            end = offset + header.size + id_len + created_len + status_len + body_len
+            if end > size:
+                break
+            order_id, created_at, status = self._keys(offset)
+            cursor = make_cursor(created_at, order_id)
+            if body_len:
+                latest[cursor] = (offset, status)
+            else:
+                latest.pop(cursor, None)
+            offset = end
+        if repair and offset < size:
+            # A torn final record, left by a crash mid-append or still being
+            # written: readers just stop before it, the startup repair cuts it
+            os.truncate(self.path, offset)
+            self._map = None
+            self._remap()
+        for cursor in sorted(latest):
+            offset, status = latest[cursor]
+            self.offsets.append(offset)
+            self.status.append(self._status_code(status))
+
+    def _remap(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, mode="rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _status_code(self, status):
+        if status not in self._status_codes:
+            self._status_codes[status] = len(self.statuses)
+            self.statuses.append(status)
+        return self._status_codes[status]
+
+    def _keys(self, offset):
+        _, id_len, created_len, status_len = header.unpack_from(self._map, offset)
+        start = offset + header.size
+        raw = self._map[start:start + id_len + created_len + status_len]
+        return (raw[:id_len].decode(), raw[id_len:id_len + created_len].decode(),
+                raw[id_len + created_len:].decode())
+
+    def _decode(self, offset):
+        body_len, id_len, created_len, status_len = header.unpack_from(self._map, offset)
+        start = offset + header.size + id_len + created_len + status_len
+        return Order(*marshal.loads(self._map[start:start + body_len]))
+
+    def _write(self, orders, deleted=False):
+        offsets = []
+        with open(self.path, mode="ab") as f:
+            position = f.tell()
+            for order in orders:
+                keys = [order.order_id.encode(), order.created_at.encode(), order.status.encode()]
+                body = b"" if deleted else marshal.dumps(tuple(getattr(order, name) for name in fields))
+                record = header.pack(len(body), *map(len, keys)) + b"".join(keys) + body
+                f.write(record)
+                offsets.append(position)
+                position += len(record)
+            f.flush()
+            os.fsync(f.fileno())
+        self._remap()
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._decode(offset) for offset in self.offsets[i]]
+        return self._decode(self.offsets[i])
+
+    def __iter__(self):
+        for i in range(len(self.offsets)):
+            yield self._decode(self.offsets[i])
+
+    def __reversed__(self):
+        for i in range(len(self.offsets) - 1, -1, -1):
+            yield self._decode(self.offsets[i])
+
+    def cursor_at(self, i):
+        order_id, created_at, _ = self._keys(self.offsets[i])
+        return make_cursor(created_at, order_id)
+
+    def bisect(self, cursor, right=False):
+        lo, hi = 0, len(self.offsets)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key = self.cursor_at(mid)
+            if key < cursor or (right and key == cursor):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _position(self, order):
+        cursor = order.cursor()
+        i = self.bisect(cursor)
+        if i < len(self.offsets) and self.cursor_at(i) == cursor:
+            return i
+        return None
+
+    def __contains__(self, order):
+        return self._position(order) is not None
+
+    def positions(self, status=None):
+        # Indexes of the live records with this status, in cursor order
+        if not status:
+            return range(len(self.offsets))
+        code = self._status_codes.get(status)
+        if code is None:
+            return []
+        return [i for i, c in enumerate(self.status) if c == code]
+
+    def get(self, order_id):
+        # No id index is kept: search the mapped file from the end for the
+        # id and accept the first hit that is the live record of that order
+        if self._map is None:
+            return None
+        needle = order_id.encode()
+        end = len(self._map)
+        while True:
+            hit = self._map.rfind(needle, 0, end)
+            if hit < header.size:
+                return None
+            offset = hit - header.size
+            _, id_len, _, _ = header.unpack_from(self._map, offset)
+            if id_len == len(needle):
+                try:
+                    order_id_found, created_at, _ = self._keys(offset)
+                except UnicodeDecodeError:
+                    order_id_found = None
+                if order_id_found == order_id:
+                    i = self.bisect(make_cursor(created_at, order_id))
+                    if i < len(self.offsets) and self.offsets[i] == offset:
+                        return self._decode(offset)
+            end = hit
+
+    def find(self, status=None, table_id=None, start_day=None, end_day=None):
+        lo = self.bisect(start_day) if start_day else 0
+        hi = self.bisect(_next_day(end_day)) if end_day else len(self.offsets)
+        code = self._status_codes.get(status) if status else None
+        if status and code is None:
+            return
+        for i in range(lo, hi):
+            if code is None or self.status[i] == code:
+                order = self._decode(self.offsets[i])
+                if not table_id or order.table_id == table_id:
+                    yield order
+
+    def append(self, orders):
+        if not orders:
+            return
+        for order, offset in zip(orders, self._write(orders)):
+            i = self.bisect(order.cursor())
+            self.offsets.insert(i, offset)
+            self.status.insert(i, self._status_code(order.status))
+
+    def update(self, order):
+        i = self._position(order)
+        if i is not None:
+            self.offsets[i] = self._write([order])[0]
+            self.status[i] = self._status_code(order.status)
+
+    def remove(self, order):
+        i = self._position(order)
+        if i is not None:
+            self._write([order], deleted=True)
+            del self.offsets[i]
+            del self.status[i]
+
+
+class PartitionedArchive:
+    # One OrderArchive file per business day, grouped in month directories.
+    # A manifest of per-day record counts lets the whole history be counted
+    # and paged without opening a partition until a query reaches its day.
+    # It also keeps each day's summarize() totals, so revenue over the whole
+    # history is read from it rather than from the orders.
+    # At most this many partitions stay open, least recently used dropped first
+    open_partitions = 32
+
+    def __init__(self, directory="orders-archive", legacy_file="orders.archive"):
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, "manifest.csv")
+        # Orders created before this day live here
+        self.day = ""
+        self.days = []
+        self.counts = {}
+        self._sizes = {}
+        # Per-day totals; None until recounted after the day changes
+        self.totals = {}
+        self.summarize = lambda orders: summarize(orders, {})
+        self._manifest_lock = threading.Lock()
+        self._partitions = OrderedDict()
+        self._partitions_lock = threading.Lock()
+        self._load_manifest()
+        if os.path.exists(legacy_file):
+            self._migrate(legacy_file)
+
+    def _path(self, day):
+        # Undated orders, from before creation times were kept, get a file
+        # of their own that sorts before every day
+        if not day:
+            return os.path.join(self.directory, "undated.orders")
+        return os.path.join(self.directory, day[:7], f"{day}.orders")
+
+    def _load_manifest(self):
+        recorded = {}
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, mode="r", newline="") as f:
+                for row in csv.reader(f):
+                    if row:
+                        recorded[row[0]] = (int(row[1]), int(row[2]), json.loads(row[3]) if len(row) > 3 and row[3] else None)
+        stale = False
+        days = [""] if os.path.exists(self._path("")) else []
+        months = sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []
+        for month in months:
+            if os.path.isdir(os.path.join(self.directory, month)):
+                days += [name[:-len(".orders")] for name in sorted(os.listdir(os.path.join(self.directory, month)))
+                         if name.endswith(".orders")]
+        for day in days:
+            size = os.path.getsize(self._path(day))
+            if recorded.get(day, (None, None))[1] == size:
+                self.counts[day], self._sizes[day], self.totals[day] = recorded[day]
+            else:
+                # Written after the manifest was, possibly cut short by a
+                # crash: repair and count it the slow way. This runs once,
+                # at startup, before anything else reads the archive.
+                self.counts[day] = len(OrderArchive(self._path(day), repair=True))
+                self._sizes[day] = os.path.getsize(self._path(day))
+                self.totals[day] = None
+                stale = True
+            self.days.append(day)
+        if stale or len(recorded) != len(self.days):
+            self._save_manifest()
+
+    def _save_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        rows = [[day, self.counts[day], self._sizes[day], json.dumps(self.totals[day]) if self.totals[day] is not None else ""]
+                for day in self.days]
+        atomic_write(self.manifest_file, lambda f: csv.writer(f).writerows(rows))
+
+    def _migrate(self, legacy_file):
+        # Split a single-file archive into day partitions
+        legacy = OrderArchive(legacy_file)
+        for day, orders in groupby(legacy, key=lambda order: order.created_at[:10]):
+            self.append(list(orders), "")
+        os.remove(legacy_file)
+
+    def _partition(self, day, keep=True):
+        # keep=False opens a private instance for reads that outlive the
+        # orders lock, such as exports: writers change only the cached one,
+        # and as the file is append-only the private one goes on reading the
+        # day as it was when opened. A partition dropped from the cache
+        # closes once no reader holds it any more.
+        if not keep:
+            return OrderArchive(self._path(day))
+        with self._partitions_lock:
+            partition = self._partitions.get(day)
+            if partition is not None:
+                self._partitions.move_to_end(day)
+                return partition
+        partition = OrderArchive(self._path(day))
+        with self._partitions_lock:
+            partition = self._partitions.setdefault(day, partition)
+            while len(self._partitions) > self.open_partitions:
+                self._partitions.popitem(last=False)
+        return partition
+
+    def _touched(self, day, partition):
+        with self._manifest_lock:
+            self._sizes[day] = os.path.getsize(self._path(day))
+            self.counts[day] = len(partition)
+            self.totals[day] = None
+            self._save_manifest()
+
+    def _recount(self, days):
+        # Days changed since their last count are decoded once more and the
+        # result kept in the manifest; callers hold _manifest_lock
+        stale = [day for day in days if self.totals[day] is None]
+        for day in stale:
+            self.totals[day] = self.summarize(self._partition(day, keep=False))
+        if stale:
+            self._save_manifest()
+
+    def day_totals(self):
+        with self._manifest_lock:
+            self._recount(self.days)
+            return {day: self.totals[day] for day in self.days}
+
+    def count(self, day, status=None):
+        # Orders archived for the day, or those of them with this status
+        if not status:
+            return self.counts.get(day, 0)
+        with self._manifest_lock:
+            self._recount([day])
+            return self.totals[day].get(status, [0])[0]
+
+    def query(self, status=None, start_day=None, end_day=None):
+        return ArchiveQuery(self, status, start_day, end_day)
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __getitem__(self, i):
+        total = len(self)
+        if isinstance(i, slice):
+            start, stop, step = i.indices(total)
+            if step != 1:
+                return list(self)[i]
+            found = []
+            first = 0
+            for day in self.days:
+                last = first + self.counts[day]
+                if start < last and first < stop:
+                    found += self._partition(day)[max(start - first, 0):min(stop, last) - first]
+                first = last
+            return found
+        if i < 0:
+            i += total
+        first = 0
+        for day in self.days:
+            if 0 <= i - first < self.counts[day]:
+                return self._partition(day)[i - first]
+            first += self.counts[day]
+        raise IndexError("order history index out of range")
+
+    def __iter__(self):
+        # Private copies of each day, so writes during a long export cannot shift it
+        for day in list(self.days):
+            yield from self._partition(day, keep=False)
+
+    def __reversed__(self):
+        for day in reversed(self.days):
+            yield from reversed(self._partition(day, keep=False))
+
+    def bisect(self, cursor, right=False):
+        day = split_cursor(cursor)[0][:10]
+        k = bisect_left(self.days, day)
+        i = sum(self.counts[d] for d in self.days[:k])
+        if k < len(self.days) and self.days[k] == day:
+            i += self._partition(day).bisect(cursor, right)
+        return i
+
+    def __contains__(self, order):
+        day = order.created_at[:10]
+        return day in self.counts and order in self._partition(day)
+
+    def get(self, order_id, day=None):
+        # `day` is the creation day read from a generated id; neighbours are
+        # tried too because the id can be stamped a moment before midnight.
+        # Without one it can only be an undated order.
+        likely = [""]
+        if day:
+            d = date.fromisoformat(day)
+            likely = [(d + timedelta(days=n)).isoformat() for n in (0, -1, 1)]
+        for d in likely:
+            if d in self.counts:
+                order = self._partition(d).get(order_id)
+                if order is not None:
+                    return order
+        return None
+
+    def find(self, status=None, table_id=None, start_day=None, end_day=None):
+        # One day at a time, skipping days with nothing of that status
+        lo = bisect_left(self.days, start_day) if start_day else 0
+        hi = bisect_right(self.days, end_day) if end_day else len(self.days)
+        for day in self.days[lo:hi]:
+            if self.count(day, status):
+                yield from self._partition(day, keep=False).find(status, table_id)
+
+    def append(self, orders, day):
+        self.day = max(self.day, day)
+        for created, group in groupby(orders, key=lambda order: order.created_at[:10]):
+            if created not in self.counts:
+                os.makedirs(os.path.dirname(self._path(created)), exist_ok=True)
+                self.days.insert(bisect_left(self.days, created), created)
+            partition = self._partition(created)
+            partition.append(list(group))
+            self._touched(created, partition)
+
+    def update(self, order):
+        day = order.created_at[:10]
+        if day in self.counts:
+            partition = self._partition(day)
+            partition.update(order)
+            self._touched(day, partition)
+
+    def remove(self, order):
+        day = order.created_at[:10]
+        if day in self.counts:
+            partition = self._partition(day)
+            partition.remove(order)
+            self._touched(day, partition)
+
+
+class ArchiveQuery:
+    # Archived orders with one status and/or within a day range, read as a
+    # sequence in cursor order like the archive itself. Per-day sizes come
+    # from the manifest, so only the days a page or an export reaches are
+    # opened, and only the matching records in them decoded.
+    def __init__(self, archive, status=None, start_day=None, end_day=None):
+        self.archive = archive
+        self.status = status
+        lo = bisect_left(archive.days, start_day) if start_day else 0
+        hi = bisect_right(archive.days, end_day) if end_day else len(archive.days)
+        self.days = archive.days[lo:hi]
+
+    def _counts(self):
+        return [(day, self.archive.count(day, self.status)) for day in self.days]
+
+    def __len__(self):
+        return sum(count for _, count in self._counts())
+
+    def __getitem__(self, i):
+        counts = self._counts()
+        total = sum(count for _, count in counts)
+        if isinstance(i, slice):
+            start, stop, step = i.indices(total)
+            if step != 1:
+                return list(self)[i]
+            found = []
+            first = 0
+            for day, count in counts:
+                last = first + count
+                if start < last and first < stop:
+                    partition = self.archive._partition(day)
+                    positions = partition.positions(self.status)[max(start - first, 0):min(stop, last) - first]
+                    found += [partition[p] for p in positions]
+                first = last
+            return found
+        if i < 0:
+            i += total
+        first = 0
+        for day, count in counts:
+            if 0 <= i - first < count:
+                partition = self.archive._partition(day)
+                return partition[partition.positions(self.status)[i - first]]
+            first += count
+        raise IndexError("order history index out of range")
+
+    def __iter__(self):
+        for day in self.days:
+            if self.archive.count(day, self.status):
+                partition = self.archive._partition(day, keep=False)
+                for p in partition.positions(self.status):
+                    yield partition[p]
+
+    def __reversed__(self):
+        for day in reversed(self.days):
+            if self.archive.count(day, self.status):
+                partition = self.archive._partition(day, keep=False)
+                for p in reversed(partition.positions(self.status)):
+                    yield partition[p]
+
+    def bisect(self, cursor, right=False):
+        day = split_cursor(cursor)[0][:10]
+        k = bisect_left(self.days, day)
+        i = sum(self.archive.count(d, self.status) for d in self.days[:k])
+        if k < len(self.days) and self.days[k] == day:
+            partition = self.archive._partition(day)
+            i += bisect_left(partition.positions(self.status), partition.bisect(cursor, right))
+        return i
+
+
+class Timeline:
+    # Archived orders followed by the ones in memory, read as one sequence in
+    # cursor order. Everything archived was created before anything in memory.
+    def __init__(self, history, recent):
+        self.history = history
+        self.recent = recent
+
+    def __len__(self):
+        return len(self.history) + len(self.recent)
+
+    def __getitem__(self, i):
+        split = len(self.history)
+        if isinstance(i, slice):
+            start, stop, step = i.indices(split + len(self.recent))
+            if step != 1:
+                return list(self)[i]
+            older = self.history[start:min(stop, split)] if start < split else []
+            return older + self.recent[max(start - split, 0):max(stop - split, 0)]
+        if i < 0:
+            i += split + len(self.recent)
+        return self.history[i] if i < split else self.recent[i - split]
+
+    def __iter__(self):
+        yield from self.history
+        yield from self.recent
+
+    def __reversed__(self):
+        yield from reversed(self.recent)
+        yield from reversed(self.history)
+
+    def bisect(self, cursor, right=False):
+        i = self.history.bisect(cursor, right)
+        if i < len(self.history):
+            return i
+        return i + bisect_cursor(self.recent, cursor, right)
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import parse_qs
+import utils
+from feed import feed
+
+try:
+    import uvicorn
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    uvicorn = None
+
+# ASGI front for the Flask app. The live feed runs on the event loop, so an
+# idle display holds a coroutine instead of a thread; every other request is
+# handed to Flask on a pool of POS_THREADS threads.
+threads = int(os.environ.get("POS_THREADS", 8))
+keepalive = 15.0
+_refresh = None
+
+
+class AsgiApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http" and scope["path"] == "/events" and scope["method"] == "GET":
+            await self._events(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                start_refresh()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await asyncio.get_running_loop().run_in_executor(None, utils.flush_writes)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _events(self, scope, receive, send):
+        # Same contract as the Flask /events route: resume from Last-Event-ID
+        # or ?last_id=, otherwise start with the next event
+        headers = dict(scope["headers"])
+        query = parse_qs(scope["query_string"].decode())
+        last_id = headers.get(b"last-event-id", b"").decode() or query.get("last_id", [""])[0] or feed.last_id()
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ]})
+
+        async def pump():
+            async for chunk in feed.astream(last_id, keepalive):
+                await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+
+        async def disconnected():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            # The server is shutting down: end the stream cleanly and let the
+            # display reconnect and resume
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            task.result()
+
+
+def start_refresh(interval=1.0):
+    # With several workers, one thread per process pulls in the others'
+    # changes so the feed carries them even when no request comes in
+    global _refresh
+    if not utils.shared or _refresh is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            utils.sync_changes()
+
+    _refresh = threading.Thread(target=run, name="feed-refresh", daemon=True)
+    _refresh.start()
+
+
+def create_app(flask_app=None):
+    # Factory for ASGI servers, e.g. uvicorn --factory asgi:create_app
+    if uvicorn is None:
+        raise RuntimeError("The ASGI server needs uvicorn and a2wsgi: pip install uvicorn a2wsgi")
+    if flask_app is None:
+        from restaurant_pos import app as flask_app
+    return AsgiApp(flask_app)
+
+
+def serve(flask_app):
+    # Entry point for `python restaurant_pos.py`: uvicorn on POS_BIND.
+    # POS_DEBUG=1 runs Flask's reloading debug server instead.
+    host, _, port = os.environ.get("POS_BIND", "127.0.0.1:5000").rpartition(":")
+    if os.environ.get("POS_DEBUG") == "1":
+        # The reloader's parent process only watches files; loading the store
+        # there too would compact stale orders over the child's on exit
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            utils.init_store()
+        flask_app.run(host, int(port), debug=True)
+        return
+    app = create_app(flask_app)
+    utils.init_store()
+    uvicorn.run(app, host=host, port=int(port), timeout_graceful_shutdown=5)
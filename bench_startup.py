@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import snapshot
+from models import Order
+from storage import CsvStorage
+
+# Compares loading order history from orders.csv with loading it from the
+# binary snapshot. Usage: python bench_startup.py [order count]
+
+
+def make_orders(count):
+    menu = [("Burger", "Food", 9.5), ("Fries", "Food", 3.0), ("Cola", "Drinks", 2.0),
+            ("Coffee", "Drinks", 2.5), ("Cake", "Dessert", 4.0)]
+    start = datetime(2024, 1, 1)
+    orders = []
+    for n in range(count):
+        lines = random.sample(menu, random.randint(1, 4))
+        items = {name: random.randint(1, 3) for name, _, _ in lines}
+        details = {name: [category, price] for name, category, price in lines}
+        total = sum(price * items[name] for name, _, price in lines)
+        created = (start + timedelta(minutes=n)).isoformat(timespec="seconds")
+        status = random.choice(["Pending", "Completed", "Completed"])
+        orders.append(Order(f"{n:020d}", f"T{n % 20}", total, items, f"Guest {n}", status,
+                            details, created, created if status == "Completed" else ""))
+    return orders
+
+
+def timed(load):
+    started = time.perf_counter()
+    orders = load()
+    return time.perf_counter() - started, len(orders)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            storage = CsvStorage()
+            storage.save_orders(make_orders(count))
+            csv_time, csv_count = timed(storage._read_orders_csv)
+            snap_time, snap_count = timed(lambda: snapshot.load(storage.orders_file))
+            csv_size = os.path.getsize(storage.orders_file)
+            snap_size = os.path.getsize(snapshot.snapshot_path(storage.orders_file))
+        finally:
+            os.chdir(cwd)
+    assert csv_count == snap_count == count
+    print(f"orders:          {count}")
+    print(f"orders.csv:      {csv_size / 1e6:.1f} MB, {csv_time:.2f} s")
+    print(f"orders.snapshot: {snap_size / 1e6:.1f} MB, {snap_time:.2f} s")
+    print(f"speedup:         {csv_time / snap_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import hashlib
+import os
+from flask import Response, make_response, request
+from persistence import changes
+
+# Version counters are per process and restart from zero, so every tag also
+# carries a token unique to this process
+_epoch = os.urandom(4).hex()
+
+
+def version_etag(collections, *extra):
+    tag = _epoch + "-" + "-".join(str(changes.version(name)) for name in collections)
+    if extra:
+        tag += "-" + hashlib.sha1(repr(extra).encode()).hexdigest()[:12]
+    return tag
+
+
+def conditional(etag, respond):
+    # A GET whose If-None-Match already names this version gets a 304 and
+    # respond() is never called; clients are told to revalidate every time
+    if request.method in ("GET", "HEAD") and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(respond())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
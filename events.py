@@ -0,0 +1,62 @@
+import os
+import threading
+
+# Change notices shared by every worker process: one "pid,collection,key"
+# line per write, appended with a single O_APPEND write so lines never tear
+events_file = "pos.events"
+rotate_bytes = 8 * 1024 * 1024
+
+
+def publish(collection, key=""):
+    line = f"{os.getpid()},{collection},{key}\n".encode()
+    fd = os.open(events_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+        size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+    if size > rotate_bytes:
+        try:
+            os.replace(events_file, events_file + ".old")
+        except FileNotFoundError:
+            pass
+
+
+class Subscriber:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inode, self._offset = self._position()
+
+    def _position(self):
+        try:
+            st = os.stat(events_file)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def poll(self):
+        # Returns (collection, key) notices from other processes since the
+        # last poll, or None when the file was rotated and notices may be lost
+        try:
+            st = os.stat(events_file)
+        except FileNotFoundError:
+            return []
+        if st.st_ino == self._inode and st.st_size == self._offset:
+            return []
+        with self._lock:
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._inode, self._offset = st.st_ino, st.st_size
+                return None
+            with open(events_file, mode="rb") as f:
+                f.seek(self._offset)
+                data = f.read(st.st_size - self._offset)
+            # Leave a partial trailing line for the next poll
+            data = data[:data.rfind(b"\n") + 1]
+            self._offset += len(data)
+        me = str(os.getpid())
+        notices = []
+        for line in data.decode().splitlines():
+            pid, collection, key = line.split(",", 2)
+            if pid != me:
+                notices.append((collection, key))
+        return notices
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+from flask import Response, abort, stream_with_context
+
+# Rows are flushed to the client in batches of this many
+chunk_rows = 500
+
+
+def menu_records(menu):
+    for name, data in list(menu.items()):
+        yield {"name": name, "category": data["category"], "price": data["price"], "available": data["available"]}
+
+
+def table_records(tables):
+    for table_id, data in list(tables.items()):
+        yield {"table_id": table_id, "seats": data["seats"], "occupied": data["occupied"]}
+
+
+def order_records(orders):
+    for order in orders:
+        yield {
+            "order_id": order.order_id,
+            "table_id": order.table_id,
+            "total": order.total,
+            "items": order.items,
+            "customer_name": order.customer_name,
+            "status": order.status,
+            "item_details": order.item_details,
+            "created_at": order.created_at,
+            "completed_at": order.completed_at,
+        }
+
+
+def stream_csv(records):
+    # Same column layout as the CSV files, nested values as JSON
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for record in records:
+        writer.writerow([json.dumps(v) if isinstance(v, dict) else v for v in record.values()])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(records):
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record))
+        if len(lines) == chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+formats = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
+
+
+def export_response(name, records, fmt="csv"):
+    if fmt not in formats:
+        abort(400, f"Unknown export format: {fmt}")
+    stream, mimetype = formats[fmt]
+    return Response(stream_with_context(stream(records)), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={name}.{fmt}"})
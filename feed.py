@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from itertools import islice
+
+
+class EventFeed:
+    # The latest events in a ring buffer for live displays. Ids look like
+    # "<epoch>-<n>", with n counting up in this process, so a client that
+    # reconnects with its last id gets exactly what it missed. An id from
+    # another process or one older than the buffer can't be replayed.
+    def __init__(self, size=1000):
+        self.epoch = os.urandom(4).hex()
+        self._events = deque(maxlen=size)
+        self._cond = threading.Condition()
+        self._next = 1
+        # (loop, future) pairs of async streams waiting for the next event
+        self._waiters = []
+
+    def emit(self, kind, data):
+        with self._cond:
+            self._events.append((self._next, kind, data))
+            self._next += 1
+            self._cond.notify_all()
+            for loop, future in self._waiters:
+                loop.call_soon_threadsafe(_wake, future)
+            self._waiters.clear()
+
+    def last_id(self):
+        with self._cond:
+            return f"{self.epoch}-{self._next - 1}"
+
+    def since(self, last_id, timeout=None):
+        # Events after last_id as (id, kind, data), waiting up to timeout
+        # for the first one; None when the client must reload instead
+        epoch, _, number = (last_id or "").partition("-")
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        after = int(number)
+        with self._cond:
+            if after >= self._next:
+                return None
+            if after == self._next - 1 and timeout:
+                self._cond.wait(timeout)
+            first = self._events[0][0] if self._events else self._next
+            if after < first - 1:
+                return None
+            return [(f"{self.epoch}-{n}", kind, data)
+                    for n, kind, data in islice(self._events, after - first + 1, None)]
+
+    def stream(self, last_id, keepalive=15.0, refresh=None, interval=1.0):
+        # Server-sent event text for one client, starting after last_id. A
+        # client that can't be replayed gets a "reset" event and should
+        # reload its state. refresh() runs every `interval` seconds to pull
+        # in changes made by other processes.
+        yield "retry: 3000\n\n"
+        wait = interval if refresh else keepalive
+        idle = 0.0
+        while True:
+            if refresh:
+                refresh()
+            events = self.since(last_id, wait)
+            if events is None:
+                last_id = self.last_id()
+                yield sse(last_id, "reset", {})
+                continue
+            for last_id, kind, data in events:
+                yield sse(last_id, kind, data)
+            idle = 0.0 if events else idle + wait
+            if idle >= keepalive:
+                # Lets proxies keep the connection open and the server notice
+                # a client that has gone away
+                idle = 0.0
+                yield ": keepalive\n\n"
+
+    async def since_async(self, last_id, timeout):
+        # since() for the event loop: waits on a future instead of a thread
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            events = self.since(last_id)
+            if events != []:
+                return events
+            self._waiters.append((loop, future))
+        await asyncio.wait([future], timeout=timeout)
+        with self._cond:
+            if (loop, future) in self._waiters:
+                self._waiters.remove((loop, future))
+        return self.since(last_id)
+
+    async def astream(self, last_id, keepalive=15.0):
+        # stream() for the event loop; other processes' changes are pulled in
+        # by one refresh thread per process rather than by each client
+        yield "retry: 3000\n\n"
+        while True:
+            events = await self.since_async(last_id, keepalive)
+            if events is None:
+                last_id = self.last_id()
+                yield sse(last_id, "reset", {})
+                continue
+            for last_id, kind, data in events:
+                yield sse(last_id, kind, data)
+            if not events:
+                yield ": keepalive\n\n"
+
+
+def sse(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+feed = EventFeed(int(os.environ.get("POS_FEED_SIZE", 1000)))
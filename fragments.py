@@ -0,0 +1,29 @@
+from flask import render_template
+from markupsafe import Markup
+from persistence import changes
+
+
+class FragmentCache:
+    # Rendered HTML fragments keyed on the version counters of the
+    # collections they show, so a card grid or option list is rendered once
+    # per change instead of once per page load
+    def __init__(self):
+        self._fragments = {}
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, template, collections, **loaders):
+        # loaders are called for the template context only on a miss; the
+        # version is read first so a change racing the render forces another
+        version = tuple(changes.version(name) for name in collections)
+        cached = self._fragments.get(template)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        html = Markup(render_template(template, **{name: load() for name, load in loaders.items()}))
+        self._fragments[template] = (version, html)
+        return html
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,28 @@
+import multiprocessing
+import os
+
+# Several workers share one SQLite store and keep each other's caches fresh
+# through the change notices in pos.events
+os.environ.setdefault("POS_SHARED", "1")
+os.environ.setdefault("POS_STORAGE", "sqlite")
+
+wsgi_app = "restaurant_pos:app"
+bind = os.environ.get("POS_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("POS_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("POS_THREADS", 8))
+
+# POS_ASGI=1 serves the ASGI front instead, so open /events streams don't
+# each hold one of the worker's threads
+if os.environ.get("POS_ASGI") == "1":
+    wsgi_app = "asgi:create_app()"
+    worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def post_worker_init(worker):
+    import utils
+    utils.init_store()
+
+
+def worker_exit(server, worker):
+    import utils
+    utils.flush_writes()
@@ -0,0 +1,87 @@
+import csv
+import io
+import os
+import threading
+import time
+from persistence import atomic_write
+
+journal_file = "orders.journal"
+
+# Compact once this many events have been appended, or on the timer below
+compact_every = 1000
+compact_interval = 60
+
+_lock = threading.RLock()
+_pending_events = 0
+_compactor = None
+# Length of the journal prefix this process holds in memory: what it
+# replayed plus its own appends. Only that much is dropped on compaction.
+_folded = 0
+
+
+def append_event(*fields):
+    global _pending_events, _folded
+    with _lock:
+        with open(journal_file, mode="a", newline="") as f:
+            start = f.tell()
+            csv.writer(f).writerow(fields)
+            end = f.tell()
+        # Past events some other process appended, ours are no longer a prefix
+        if start == _folded:
+            _folded = end
+        _pending_events += 1
+
+
+def replay(apply):
+    global _folded
+    if not os.path.exists(journal_file):
+        return 0
+    count = 0
+    with open(journal_file, mode="r", newline="") as f:
+        text = f.read()
+        _folded = f.tell()
+    for row in csv.reader(io.StringIO(text, newline="")):
+        if row:
+            apply(row)
+            count += 1
+    return count
+
+
+def compact(snapshot):
+    global _pending_events, _folded
+    with _lock:
+        snapshot()
+        size = os.path.getsize(journal_file) if os.path.exists(journal_file) else 0
+        if size <= _folded:
+            open(journal_file, mode="w").close()
+        elif _folded:
+            # Keep the events the snapshot never saw for the next load to replay
+            with open(journal_file, mode="rb") as f:
+                f.seek(_folded)
+                tail = f.read()
+            atomic_write(journal_file, lambda out: out.write(tail), binary=True)
+        _folded = 0
+        _pending_events = 0
+
+
+def pending_events():
+    return _pending_events
+
+
+def start_compactor(compact_orders):
+    global _compactor
+    if _compactor is not None:
+        return _compactor
+
+    def run():
+        last = time.monotonic()
+        while True:
+            time.sleep(1)
+            due = time.monotonic() - last >= compact_interval
+            if _pending_events and (due or _pending_events >= compact_every):
+                compact_orders()
+                last = time.monotonic()
+
+    _compactor = threading.Thread(target=run, name="orders-compactor", daemon=True)
+    _compactor.start()
+    return _compactor
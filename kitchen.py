@@ -0,0 +1,121 @@
+import heapq
+import threading
+from collections import defaultdict
+
+# A ticket moves through these states at its station
+states = ("queued", "in-progress", "ready")
+
+
+def parse_stations(spec):
+    # "Drinks=bar,Dessert=pastry"; categories not listed go to the default station
+    return dict(part.strip().split("=", 1) for part in spec.split(",") if "=" in part)
+
+
+class Ticket:
+    __slots__ = ("ticket_id", "order_id", "station", "table_id", "customer_name", "items", "created_at", "state")
+
+    def __init__(self, order, station, items):
+        self.ticket_id = f"{order.order_id}-{station}"
+        self.order_id = order.order_id
+        self.station = station
+        self.table_id = order.table_id
+        self.customer_name = order.customer_name
+        self.items = items
+        self.created_at = order.created_at
+        self.state = "queued"
+
+    def key(self):
+        # Oldest order first; tickets of the same age are grouped by table
+        return (self.created_at, self.table_id, self.ticket_id)
+
+    def record(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class KitchenQueue:
+    # Each pending order is split into one ticket per station, routed by the
+    # category of its items. Every station keeps a heap of its queued
+    # tickets, so taking the next one is O(log n). Tickets that leave the
+    # queue any other way keep their heap entry until it reaches the top.
+    def __init__(self, routes=None, default="line"):
+        self.routes = routes or {}
+        self.default = default
+        self._lock = threading.Lock()
+        self.tickets = {}
+        self.by_order = {}
+        self._queues = defaultdict(list)
+
+    def station(self, category):
+        return self.routes.get(category, self.default)
+
+    def stations(self):
+        with self._lock:
+            return sorted(set(self.routes.values()) | {self.default} | set(self._queues))
+
+    def rebuild(self, orders, menu):
+        with self._lock:
+            self.tickets.clear()
+            self.by_order.clear()
+            self._queues.clear()
+            for order in orders:
+                if order.status == "Pending":
+                    self._add(order, menu)
+
+    def add(self, order, menu):
+        # Returns the new tickets; an order that already has tickets gets none
+        with self._lock:
+            return self._add(order, menu)
+
+    def _add(self, order, menu):
+        if order.order_id in self.by_order:
+            return []
+        split = {}
+        for name, qty in order.items.items():
+            # Orders carry the category each item had when it was placed
+            if name in order.item_details:
+                category = order.item_details[name][0]
+            else:
+                category = menu[name]["category"] if name in menu else "Unknown"
+            split.setdefault(self.station(category), {})[name] = qty
+        added = [Ticket(order, station, items) for station, items in split.items()]
+        self.by_order[order.order_id] = [ticket.ticket_id for ticket in added]
+        for ticket in added:
+            self.tickets[ticket.ticket_id] = ticket
+            heapq.heappush(self._queues[ticket.station], (ticket.key(), ticket.ticket_id))
+        return added
+
+    def remove(self, order_id):
+        with self._lock:
+            return [self.tickets.pop(ticket_id) for ticket_id in self.by_order.pop(order_id, [])]
+
+    def get(self, ticket_id):
+        return self.tickets.get(ticket_id)
+
+    def next(self, station):
+        # Starts and returns the oldest queued ticket at the station
+        with self._lock:
+            queue = self._queues.get(station, [])
+            while queue:
+                _, ticket_id = heapq.heappop(queue)
+                ticket = self.tickets.get(ticket_id)
+                if ticket is not None and ticket.state == "queued":
+                    ticket.state = "in-progress"
+                    return ticket
+            return None
+
+    def set_state(self, ticket_id, state):
+        # A ticket sent back to queued takes its original place in line
+        with self._lock:
+            ticket = self.tickets.get(ticket_id)
+            if ticket is None:
+                return None
+            if state == "queued" and ticket.state != "queued":
+                heapq.heappush(self._queues[ticket.station], (ticket.key(), ticket_id))
+            ticket.state = state
+            return ticket
+
+    def board(self, station):
+        # The station's tickets by state, each list oldest first
+        with self._lock:
+            tickets = sorted((t for t in self.tickets.values() if t.station == station), key=Ticket.key)
+        return {state: [t.record() for t in tickets if t.state == state] for state in states}
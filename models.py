@@ -0,0 +1,81 @@
+import json
+import sys
+from datetime import datetime
+
+# The statuses an order can be in
+statuses = ("Pending", "Completed")
+
+# Order ids: 10 chars of millisecond time, 6 chars of per-process node and a
+# 4 char counter, all Crockford base32 so ids sort in creation order
+id_alphabet = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def order_id_time(order_id):
+    ms = 0
+    for char in order_id[:10]:
+        ms = ms * 32 + id_alphabet.index(char)
+    return datetime.fromtimestamp(ms / 1000)
+
+
+def order_id_day(order_id):
+    # Creation day of a generated id; None for anything else, such as the
+    # 8 char ids of orders from before creation times were kept
+    if len(order_id) != 20 or order_id.strip(id_alphabet):
+        return None
+    try:
+        return order_id_time(order_id).date().isoformat()
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def make_cursor(created_at, order_id):
+    # Sorts like (created_at, order_id), as the SQL queries order them: "!"
+    # comes before every character of a timestamp, so undated orders from
+    # before creation times were kept come first
+    return f"{created_at}!{order_id}"
+
+
+def split_cursor(cursor):
+    # (created_at, order_id); a bare day or timestamp has an empty id
+    created_at, _, order_id = cursor.partition("!")
+    return created_at, order_id
+
+
+class Order:
+    __slots__ = ("order_id", "table_id", "total", "items", "customer_name", "status",
+                 "item_details", "created_at", "completed_at")
+
+    def __init__(self, order_id, table_id, total, items, customer_name, status="Pending",
+                 item_details=None, created_at="", completed_at=""):
+        self.order_id = order_id
+        # Table ids and statuses repeat across every order, so share one copy
+        self.table_id = sys.intern(table_id)
+        self.total = total
+        self.items = items
+        self.customer_name = customer_name
+        self.status = sys.intern(status)
+        self.item_details = item_details if item_details is not None else {}
+        self.created_at = created_at
+        self.completed_at = completed_at
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            row[0], row[1], float(row[2]),
+            json.loads(row[3]) if row[3] else {},
+            row[4], row[5],
+            json.loads(row[6]) if len(row) > 6 and row[6] else {},
+            row[7] if len(row) > 7 else "",
+            row[8] if len(row) > 8 else "",
+        )
+
+    def to_row(self):
+        return [self.order_id, self.table_id, self.total, json.dumps(self.items), self.customer_name,
+                self.status, json.dumps(self.item_details), self.created_at, self.completed_at]
+
+    def cursor(self):
+        # Sorts in creation order: timestamp first, then the time-ordered id
+        return make_cursor(self.created_at, self.order_id)
+
+    def __repr__(self):
+        return f"Order({self.order_id!r}, {self.table_id!r}, {self.total!r}, {self.status!r})"
@@ -0,0 +1,89 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from models import Order
+
+
+class OrderIndex:
+    # Buckets are dicts keyed by order id so they keep placement order and
+    # support O(1) removal when an order moves between statuses
+    def __init__(self):
+        self.by_id = {}
+        self.status = defaultdict(dict)
+        self.table = defaultdict(dict)
+        self.table_status = defaultdict(dict)
+        # Sorted list of business days (YYYY-MM-DD) plus the orders created on each
+        self.days = []
+        self.by_day = {}
+
+    def rebuild(self, orders):
+        self.__init__()
+        for order in orders:
+            self.add(order)
+
+    def add(self, order):
+        self.by_id[order.order_id] = order
+        self.status[order.status][order.order_id] = order
+        self.table[order.table_id][order.order_id] = order
+        self.table_status[order.table_id, order.status][order.order_id] = order
+        day = order.created_at[:10]
+        if day:
+            if day not in self.by_day:
+                self.by_day[day] = {}
+                if not self.days or day > self.days[-1]:
+                    self.days.append(day)
+                else:
+                    insort(self.days, day)
+            self.by_day[day][order.order_id] = order
+
+    def remove(self, order):
+        self.by_id.pop(order.order_id, None)
+        self._discard(self.status, order.status, order.order_id)
+        self._discard(self.table, order.table_id, order.order_id)
+        self._discard(self.table_status, (order.table_id, order.status), order.order_id)
+        day = order.created_at[:10]
+        if day in self.by_day:
+            self._discard(self.by_day, day, order.order_id)
+            if day not in self.by_day:
+                del self.days[bisect_left(self.days, day)]
+
+    def status_changed(self, order, old_status):
+        if old_status == order.status:
+            return
+        self._discard(self.status, old_status, order.order_id)
+        self._discard(self.table_status, (order.table_id, old_status), order.order_id)
+        self.status[order.status][order.order_id] = order
+        self.table_status[order.table_id, order.status][order.order_id] = order
+
+    def _discard(self, index, key, order_id):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(order_id, None)
+            if not bucket:
+                del index[key]
+
+    def get(self, order_id):
+        return self.by_id.get(order_id)
+
+    def day_range(self, start_day=None, end_day=None):
+        lo = bisect_left(self.days, start_day) if start_day else 0
+        hi = bisect_right(self.days, end_day) if end_day else len(self.days)
+        return self.days[lo:hi]
+
+    def find(self, status=None, table_id=None, start_day=None, end_day=None):
+        if start_day or end_day:
+            return [
+                order
+                for day in self.day_range(start_day, end_day)
+                for order in self.by_day[day].values()
+                if (not status or order.status == status) and (not table_id or order.table_id == table_id)
+            ]
+        # Status buckets are in the order orders reached that status
+        if status and table_id:
+            return sorted(self.table_status.get((table_id, status), {}).values(), key=Order.cursor)
+        elif status:
+            return sorted(self.status.get(status, {}).values(), key=Order.cursor)
+        elif table_id:
+            bucket = self.table.get(table_id, {})
+        else:
+            bucket = self.by_id
+        return list(bucket.values())
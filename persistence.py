@@ -0,0 +1,230 @@
+import logging
+import os
+import queue
+import stat
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+log = logging.getLogger(__name__)
+
+# Read once at import, as reading it means setting it for a moment
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def atomic_write(path, write, binary=False):
+    # Write a sibling temp file, fsync it and rename it over the target, so
+    # a crash leaves either the old file or the new one, never a torn one
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with (os.fdopen(fd, mode="wb") if binary else os.fdopen(fd, mode="w", newline="")) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp makes the file 0600: keep the mode the target had, or the
+        # one open() would have given a new file
+        os.chmod(tmp, _file_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    fsync_directory(directory)
+
+
+def _file_mode(path):
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_umask
+
+
+def fsync_file(path):
+    if os.path.exists(path):
+        with open(path, mode="rb") as f:
+            os.fsync(f.fileno())
+
+
+def fsync_directory(directory):
+    # Makes the rename durable; not supported on Windows
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Batch:
+    def __init__(self):
+        self.actions = {}
+        self.errors = {}
+        self.done = False
+
+
+class GroupCommit:
+    # Saves that arrive within `window` seconds of each other are flushed
+    # together by whichever caller got there first. Repeated saves of the
+    # same key collapse into one write. Every caller returns once the batch
+    # holding its save is on disk.
+    def __init__(self, window=0.005):
+        self.window = window
+        self._cond = threading.Condition()
+        self._collecting = _Batch()
+        self._leading = False
+        self.commits = 0
+        self.flushes = 0
+
+    def commit(self, key, action):
+        with self._cond:
+            batch = self._collecting
+            batch.actions[key] = action
+            self.commits += 1
+            while not batch.done:
+                if self._leading:
+                    self._cond.wait()
+                else:
+                    self._lead()
+        if key in batch.errors:
+            raise batch.errors[key]
+
+    def _lead(self):
+        # Called with the condition held; returns with it held
+        self._leading = True
+        self._cond.release()
+        try:
+            if self.window:
+                time.sleep(self.window)
+        finally:
+            self._cond.acquire()
+        batch = self._collecting
+        self._collecting = _Batch()
+        self._cond.release()
+        try:
+            for key, action in batch.actions.items():
+                try:
+                    action()
+                except Exception as exc:
+                    batch.errors[key] = exc
+        finally:
+            self._cond.acquire()
+            batch.done = True
+            self.flushes += 1
+            self._leading = False
+            self._cond.notify_all()
+
+
+committer = GroupCommit(float(os.environ.get("POS_COMMIT_WINDOW_MS", 5)) / 1000)
+
+
+class ChangeTracker:
+    # A version counter per in-memory collection, bumped on every change,
+    # and the version each save target last wrote. Saves of a collection
+    # that has not changed since its target was written are skipped.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.versions = defaultdict(int)
+        self.saved = {}
+        self.written = defaultdict(int)
+        self.skipped = defaultdict(int)
+
+    def touch(self, collection):
+        with self._lock:
+            self.versions[collection] += 1
+
+    def version(self, collection):
+        return self.versions[collection]
+
+    def loaded(self, collection, *targets):
+        # Memory was just read from storage: it changed, but is already saved
+        with self._lock:
+            self.versions[collection] += 1
+            for target in targets:
+                self.saved[target] = self.versions[collection]
+
+    def needs_write(self, target, collection):
+        with self._lock:
+            if self.saved.get(target) == self.versions[collection]:
+                self.skipped[target] += 1
+                return False
+            return True
+
+    def wrote(self, target, version):
+        with self._lock:
+            self.saved[target] = max(version, self.saved.get(target, version))
+            self.written[target] += 1
+
+    def stats(self):
+        with self._lock:
+            targets = set(self.written) | set(self.skipped)
+            return {target: {"written": self.written[target], "skipped": self.skipped[target]}
+                    for target in sorted(targets)}
+
+
+changes = ChangeTracker()
+
+
+class WriteBehind:
+    # Routes mark a collection dirty and return at once; a background thread
+    # writes each dirty collection once per flush interval. Every mark takes
+    # a queue slot until it is written, so when the disk falls behind by
+    # `max_pending` changes, callers block until the writer catches up.
+    def __init__(self, interval=0.05, max_pending=1000):
+        self.interval = interval
+        self._queue = queue.Queue(max_pending)
+        self._actions = {}
+        self._thread = None
+        self.writes = 0
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def mark(self, key, action):
+        self._actions[key] = action
+        self._queue.put(key)
+
+    def flush(self):
+        self._queue.join()
+
+    def stop(self):
+        if self.running():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            keys = [self._queue.get()]
+            if self.interval:
+                time.sleep(self.interval)
+            while True:
+                try:
+                    keys.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in keys
+            for key in dict.fromkeys(k for k in keys if k is not None):
+                try:
+                    self._actions[key]()
+                    self.writes += 1
+                except Exception:
+                    log.exception("write-behind save of %s failed", key)
+            for _ in keys:
+                self._queue.task_done()
+            if stopping:
+                return
+
+
+writer = WriteBehind(float(os.environ.get("POS_FLUSH_INTERVAL_MS", 50)) / 1000,
+                     int(os.environ.get("POS_WRITE_QUEUE", 1000)))
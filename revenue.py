@@ -0,0 +1,158 @@
+from array import array
+from datetime import date
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def order_lines(order, menu):
+    # New orders carry a category/price snapshot per item. Older orders are
+    # split by current menu prices, scaled to what was actually charged.
+    details = order.item_details
+    remaining = order.total
+    legacy = []
+    for name, qty in order.items.items():
+        if name in details:
+            category, price = details[name]
+            remaining -= price * qty
+            yield category, price * qty
+        elif name in menu:
+            legacy.append((menu[name]["category"], menu[name]["price"] * qty))
+    weight = sum(w for _, w in legacy)
+    if weight:
+        for category, w in legacy:
+            yield category, remaining * w / weight
+    elif abs(remaining) >= 0.005:
+        yield "Unknown", remaining
+
+
+def order_revenue(order, menu):
+    revenue = {}
+    for category, amount in order_lines(order, menu):
+        revenue[category] = revenue.get(category, 0.0) + amount
+    return revenue
+
+
+def summarize(orders, menu):
+    # {status: [order count, {category: revenue}]}, how a past day is kept
+    totals = {}
+    for order in orders:
+        entry = totals.setdefault(order.status, [0, {}])
+        entry[0] += 1
+        for category, amount in order_lines(order, menu):
+            entry[1][category] = entry[1].get(category, 0.0) + amount
+    return totals
+
+
+def day_number(day):
+    # Undated orders, from before creation times were kept, count as day 0
+    return date.fromisoformat(day).toordinal() if day else 0
+
+
+class RevenueEngine:
+    # Order lines are kept as parallel columns (slot, category code, amount)
+    # so a breakdown is a single masked bincount instead of a walk over orders.
+    # Past days hold no lines, only their summarize() totals per day.
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.days = {}
+        self.categories = {}
+        self.statuses = {}
+        self.slots = {}
+        self.order_status = array("b")
+        self.order_day = array("l")
+        self.line_slot = array("l")
+        self.line_category = array("l")
+        self.line_amount = array("d")
+
+    def rebuild(self, orders, menu, days=None):
+        self.reset()
+        for day, totals in (days or {}).items():
+            self.days[day_number(day)] = {
+                status: [count, dict(revenue)] for status, (count, revenue) in totals.items()}
+        for order in orders:
+            self.add(order, menu)
+
+    def _status_code(self, status):
+        return self.statuses.setdefault(status, len(self.statuses))
+
+    def add(self, order, menu):
+        slot = len(self.order_status)
+        self.slots[order.order_id] = slot
+        self.order_status.append(self._status_code(order.status))
+        self.order_day.append(day_number(order.created_at[:10]))
+        for category, amount in order_lines(order, menu):
+            self.line_slot.append(slot)
+            self.line_category.append(self.categories.setdefault(category, len(self.categories)))
+            self.line_amount.append(amount)
+
+    def set_status(self, order_id, status):
+        if order_id in self.slots:
+            self.order_status[self.slots[order_id]] = self._status_code(status)
+
+    def adjust_day(self, order, menu, sign, status=None):
+        # Adds (sign 1) or takes out (-1) a past order under `status`,
+        # by default its current one
+        totals = self.days.setdefault(day_number(order.created_at[:10]), {})
+        entry = totals.setdefault(status or order.status, [0, {}])
+        entry[0] += sign
+        for category, amount in order_lines(order, menu):
+            entry[1][category] = entry[1].get(category, 0.0) + sign * amount
+            if abs(entry[1][category]) < 0.005:
+                del entry[1][category]
+
+    def count(self, status):
+        code = self.statuses.get(status)
+        past = sum(totals[status][0] for totals in self.days.values() if status in totals)
+        return past + (0 if code is None else self.order_status.count(code))
+
+    def remove(self, order_id):
+        slot = self.slots.pop(order_id, None)
+        if slot is not None:
+            self.order_status[slot] = -1
+
+    def breakdown(self, status="Completed", start_day=None, end_day=None):
+        first = date.fromisoformat(start_day).toordinal() if start_day else 0
+        last = date.fromisoformat(end_day).toordinal() if end_day else None
+        revenue = self._recent_breakdown(status, first, last)
+        for day, totals in self.days.items():
+            if status in totals and first <= day and (last is None or day <= last):
+                for category, amount in totals[status][1].items():
+                    revenue[category] = revenue.get(category, 0.0) + amount
+        return {category: amount for category, amount in revenue.items() if amount}
+
+    def _recent_breakdown(self, status, first, last):
+        if status not in self.statuses or not self.line_slot:
+            return {}
+        code = self.statuses[status]
+        if numpy is not None:
+            order_status = numpy.frombuffer(self.order_status, dtype=numpy.int8)
+            slots = numpy.frombuffer(self.line_slot, dtype=numpy.dtype("l"))
+            selected = order_status == code
+            if first or last is not None:
+                order_day = numpy.frombuffer(self.order_day, dtype=numpy.dtype("l"))
+                selected &= order_day >= first
+                if last is not None:
+                    selected &= order_day <= last
+            mask = selected[slots]
+            sums = numpy.bincount(numpy.frombuffer(self.line_category, dtype=numpy.dtype("l"))[mask],
+                                  weights=numpy.frombuffer(self.line_amount, dtype=numpy.float64)[mask],
+                                  minlength=len(self.categories))
+        else:
+            sums = [0.0] * len(self.categories)
+            order_status = self.order_status
+            order_day = self.order_day
+            for slot, category, amount in zip(self.line_slot, self.line_category, self.line_amount):
+                if order_status[slot] == code and first <= order_day[slot] and (last is None or order_day[slot] <= last):
+                    sums[category] += amount
+        return {category: float(sums[c]) for category, c in self.categories.items() if sums[c]}
+
+
+def category_breakdown(orders, menu, status="Completed"):
+    engine = RevenueEngine()
+    engine.rebuild(orders, menu)
+    return engine.breakdown(status)
@@ -0,0 +1,121 @@
+import difflib
+import heapq
+import re
+
+_word = re.compile(r"\w+")
+
+
+def tokens(text):
+    return _word.findall(text.lower())
+
+
+class MenuSearch:
+    # Typeahead over menu item names and categories. A token index maps each
+    # word to the items containing it, and a trie over those words keeps, at
+    # every prefix, the items reachable below it, so a query token of any
+    # length is one walk down the trie. Edits update only the item's words.
+    def __init__(self):
+        self.items = {}
+        # Lowercased name and its words per item, for ranking
+        self.names = {}
+        self.index = {}
+        # Words by first letter: the candidates for a misspelt word
+        self.initials = {}
+        self.trie = {"items": set(), "next": {}}
+
+    def rebuild(self, menu):
+        self.__init__()
+        for name, data in menu.items():
+            self.add(name, data)
+
+    def add(self, name, data):
+        old = self.items.get(name)
+        self.items[name] = data
+        self.names[name] = (name.lower(), tokens(name))
+        words = set(tokens(name)) | set(tokens(data["category"]))
+        if old is not None:
+            old_words = set(tokens(name)) | set(tokens(old["category"]))
+            for word in old_words - words:
+                self._unlink(word, name)
+            words -= old_words
+        for word in words:
+            if word not in self.index:
+                self.initials.setdefault(word[0], set()).add(word)
+            self.index.setdefault(word, set()).add(name)
+            node = self.trie
+            for char in word:
+                node = node["next"].setdefault(char, {"items": set(), "next": {}})
+                node["items"].add(name)
+
+    def remove(self, name):
+        data = self.items.pop(name, None)
+        self.names.pop(name, None)
+        if data is not None:
+            for word in set(tokens(name)) | set(tokens(data["category"])):
+                self._unlink(word, name)
+
+    def _unlink(self, word, name):
+        names = self.index.get(word)
+        if names is None:
+            return
+        names.discard(name)
+        if not names:
+            del self.index[word]
+            self.initials[word[0]].discard(word)
+        path = []
+        node = self.trie
+        for char in word:
+            path.append((node, char))
+            node = node["next"][char]
+            node["items"].discard(name)
+        # Drop the branch once no item uses it
+        for parent, char in reversed(path):
+            child = parent["next"][char]
+            if child["items"] or child["next"]:
+                break
+            del parent["next"][char]
+
+    def _prefix(self, word):
+        node = self.trie
+        for char in word:
+            node = node["next"].get(char)
+            if node is None:
+                return set()
+        return node["items"]
+
+    def _fuzzy(self, word):
+        # Misspelt words match the closest whole words in the index
+        names = set()
+        candidates = self.initials.get(word[0], ())
+        for close in difflib.get_close_matches(word, candidates, n=3, cutoff=0.75):
+            names |= self.index[close]
+        return names
+
+    def search(self, query, limit=10, available_only=True):
+        # Items matching every query word, by prefix or else by spelling.
+        # Names that start with the query rank first, then names containing
+        # a word that starts with it, then category-only matches.
+        words = tokens(query)
+        if words:
+            matches = None
+            for word in words:
+                names = self._prefix(word) or self._fuzzy(word)
+                matches = set(names) if matches is None else matches & names
+                if not matches:
+                    return []
+        else:
+            matches = self.items
+        if available_only:
+            matches = [name for name in matches if self.items[name]["available"]]
+        query = query.strip().lower()
+        last = words[-1] if words else ""
+
+        def rank(name):
+            lowered, name_words = self.names[name]
+            if lowered.startswith(query):
+                return (0, lowered)
+            if any(word.startswith(last) for word in name_words):
+                return (1, lowered)
+            return (2, lowered)
+
+        return heapq.nsmallest(limit, matches, key=rank)
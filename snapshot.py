@@ -0,0 +1,46 @@
+import gc
+import marshal
+import os
+from models import Order
+from persistence import atomic_write
+
+# Binary copy of orders.csv, stored as one marshalled list per column so a
+# restart skips CSV parsing and the per-row json.loads. It is only trusted
+# while orders.csv still has the size and mtime it was written against.
+format_version = 1
+fields = Order.__slots__
+
+
+def snapshot_path(orders_file):
+    return os.path.splitext(orders_file)[0] + ".snapshot"
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def save(orders_file, orders):
+    columns = tuple([getattr(order, name) for order in orders] for name in fields)
+    data = marshal.dumps((format_version, _stamp(orders_file), fields, columns))
+    atomic_write(snapshot_path(orders_file), lambda f: f.write(data), binary=True)
+
+
+def load(orders_file):
+    # Returns the orders, or None when the snapshot is missing, stale or unreadable
+    path = snapshot_path(orders_file)
+    # Building hundreds of thousands of dicts would otherwise trigger a long
+    # run of garbage collections over objects that are all still alive
+    paused = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, mode="rb") as f:
+            version, stamp, names, columns = marshal.loads(f.read())
+        if version != format_version or names != fields or stamp != _stamp(orders_file):
+            return None
+        return [Order(*row) for row in zip(*columns)]
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    finally:
+        if paused:
+            gc.enable()
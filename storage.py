@@ -0,0 +1,455 @@
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date, timedelta
+import journal
+from archive import PartitionedArchive
+import snapshot
+from models import Order, order_id_day, split_cursor
+from persistence import atomic_write, fsync_file
+from revenue import summarize
+
+
+class CsvStorage:
+    # Queries are answered from the in-memory order index
+    indexed_queries = False
+
+    def __init__(self, menu_file="menu.csv", orders_file="orders.csv", tables_file="tables.csv",
+                 archive_dir="orders-archive"):
+        self.menu_file = menu_file
+        self.orders_file = orders_file
+        self.tables_file = tables_file
+        # Orders from past days, one file per day; orders.csv and the
+        # journal hold the rest
+        self.history = PartitionedArchive(archive_dir)
+
+    def load_menu(self):
+        menu = {}
+        if os.path.exists(self.menu_file):
+            with open(self.menu_file, mode="r", newline="") as f:
+                reader = csv.reader(f)
+                for row in reader:
+                    if row:
+                        menu[row[0]] = {
+                            "category": row[1],
+                            "price": float(row[2]),
+                            "available": row[3] == "True"
+                        }
+        return menu
+
+    def load_orders(self):
+        orders = snapshot.load(self.orders_file)
+        if orders is None:
+            orders = self._read_orders_csv()
+        by_id = {o.order_id: o for o in orders}
+        journal.replay(lambda row: self._apply_order_event(row, orders, by_id))
+        # Orders archived since the last compaction are still in orders.csv
+        return [order for order in orders if order not in self.history]
+
+    def _read_orders_csv(self):
+        orders = []
+        if os.path.exists(self.orders_file):
+            with open(self.orders_file, mode="r", newline="") as f:
+                reader = csv.reader(f)
+                for row in reader:
+                    if row:
+                        orders.append(Order.from_row(row))
+        return orders
+
+    def _apply_order_event(self, row, orders, by_id):
+        # Replaying an event already folded into the snapshot is harmless
+        if row[0] == "create":
+            if row[1] not in by_id:
+                order = Order.from_row(row[1:])
+                orders.append(order)
+                by_id[order.order_id] = order
+        elif row[0] == "status":
+            order = by_id.get(row[1]) or self.history.get(row[1], order_id_day(row[1]))
+            if order is not None and (order.status, order.completed_at) != (row[2], row[3] if len(row) > 3 else ""):
+                order.status = sys.intern(row[2])
+                order.completed_at = row[3] if len(row) > 3 else ""
+                if row[1] not in by_id:
+                    self.history.update(order)
+        elif row[0] == "delete":
+            if row[1] in by_id:
+                orders.remove(by_id.pop(row[1]))
+            else:
+                order = self.history.get(row[1], order_id_day(row[1]))
+                if order is not None:
+                    self.history.remove(order)
+
+    def load_tables(self):
+        tables = {}
+        if os.path.exists(self.tables_file):
+            with open(self.tables_file, mode="r", newline="") as f:
+                reader = csv.reader(f)
+                for row in reader:
+                    if row:
+                        tables[row[0]] = {"seats": int(row[1]), "occupied": row[2] == "True"}
+        return tables
+
+    def save_menu(self, menu):
+        def write(f):
+            writer = csv.writer(f)
+            for name, data in menu.items():
+                writer.writerow([name, data["category"], data["price"], data["available"]])
+        atomic_write(self.menu_file, write)
+
+    def save_orders(self, orders):
+        def write(f):
+            writer = csv.writer(f)
+            for order in orders:
+                writer.writerow(order.to_row())
+        atomic_write(self.orders_file, write)
+        snapshot.save(self.orders_file, orders)
+
+    def save_tables(self, tables):
+        def write(f):
+            writer = csv.writer(f)
+            for table_id, data in tables.items():
+                writer.writerow([table_id, data["seats"], data["occupied"]])
+        atomic_write(self.tables_file, write)
+
+    def append_order(self, order):
+        journal.append_event("create", *order.to_row())
+
+    def update_order_status(self, order_id, status, completed_at):
+        journal.append_event("status", order_id, status, completed_at)
+
+    def delete_order(self, order_id):
+        journal.append_event("delete", order_id)
+
+    def sync_orders(self):
+        fsync_file(journal.journal_file)
+
+    def compact(self, orders):
+        journal.compact(lambda: self.save_orders(orders))
+
+    def start_compaction(self, compact):
+        journal.start_compactor(compact)
+
+    def archive_orders(self, orders, day):
+        self.history.append(orders, day)
+
+
+class SqliteStorage:
+    indexed_queries = True
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS menu (
+        name TEXT PRIMARY KEY,
+        category TEXT NOT NULL,
+        price REAL NOT NULL,
+        available INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS tables (
+        table_id TEXT PRIMARY KEY,
+        seats INTEGER NOT NULL,
+        occupied INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS orders (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id TEXT NOT NULL UNIQUE,
+        table_id TEXT NOT NULL,
+        total REAL NOT NULL,
+        items TEXT NOT NULL,
+        customer TEXT NOT NULL,
+        status TEXT NOT NULL,
+        item_details TEXT NOT NULL DEFAULT '{}',
+        created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')),
+        completed_at TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS orders_status_cursor ON orders (status, created_at, order_id);
+    CREATE INDEX IF NOT EXISTS orders_table ON orders (table_id);
+    CREATE INDEX IF NOT EXISTS orders_cursor ON orders (created_at, order_id);
+    CREATE TABLE IF NOT EXISTS tickets (
+        ticket_id TEXT PRIMARY KEY,
+        state TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS day_totals (
+        day TEXT PRIMARY KEY,
+        totals TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path="pos.db"):
+        self.path = path
+        self._local = threading.local()
+        # Menu and table rows as this process last read or wrote them
+        self._saved = {"menu": {}, "tables": {}}
+        self._saved_lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(self.schema)
+            columns = [row[1] for row in db.execute("PRAGMA table_info(orders)")]
+            if "item_details" not in columns:
+                db.execute("ALTER TABLE orders ADD COLUMN item_details TEXT NOT NULL DEFAULT '{}'")
+            if "completed_at" not in columns:
+                db.execute("ALTER TABLE orders ADD COLUMN completed_at TEXT NOT NULL DEFAULT ''")
+            # Superseded by orders_cursor and orders_status_cursor
+            db.execute("DROP INDEX IF EXISTS orders_created")
+            db.execute("DROP INDEX IF EXISTS orders_status")
+        self.history = SqliteHistory(self, date.today().isoformat())
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def load_menu(self):
+        rows = self._connect().execute("SELECT name, category, price, available FROM menu").fetchall()
+        with self._saved_lock:
+            self._saved["menu"] = {row[0]: row for row in rows}
+        return {name: {"category": category, "price": price, "available": bool(available)}
+                for name, category, price, available in rows}
+
+    def load_orders(self):
+        rows = self._connect().execute(
+            "SELECT order_id, table_id, total, items, customer, status, item_details, created_at, completed_at FROM orders "
+            "WHERE created_at >= ? ORDER BY created_at, order_id", (self.history.day,))
+        return [Order.from_row(row) for row in rows]
+
+    def load_order(self, order_id):
+        row = self._connect().execute(
+            "SELECT order_id, table_id, total, items, customer, status, item_details, created_at, completed_at FROM orders "
+            "WHERE order_id = ?", (order_id,)).fetchone()
+        return Order.from_row(row) if row else None
+
+    def load_tables(self):
+        rows = self._connect().execute("SELECT table_id, seats, occupied FROM tables").fetchall()
+        with self._saved_lock:
+            self._saved["tables"] = {row[0]: row for row in rows}
+        return {table_id: {"seats": seats, "occupied": bool(occupied)} for table_id, seats, occupied in rows}
+
+    def _save_rows(self, table, key, rows):
+        # Writes only the rows this process changed since it last read or
+        # wrote the table, so workers sharing the database keep each
+        # other's edits
+        with self._saved_lock, self._connect() as db:
+            saved = self._saved[table]
+            changed = [row for name, row in rows.items() if saved.get(name) != row]
+            if changed:
+                db.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({', '.join('?' * len(changed[0]))})", changed)
+            db.executemany(f"DELETE FROM {table} WHERE {key} = ?", [(name,) for name in saved.keys() - rows.keys()])
+            self._saved[table] = rows
+
+    def save_menu(self, menu):
+        self._save_rows("menu", "name", {
+            name: (name, data["category"], data["price"], int(data["available"])) for name, data in menu.items()})
+
+    def save_orders(self, orders):
+        with self._connect() as db:
+            db.executemany(
+                "INSERT INTO orders (order_id, table_id, total, items, customer, status, item_details, created_at, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (order_id) DO UPDATE SET status = excluded.status, completed_at = excluded.completed_at",
+                [order.to_row() for order in orders])
+
+    def save_tables(self, tables):
+        self._save_rows("tables", "table_id", {
+            table_id: (table_id, data["seats"], int(data["occupied"])) for table_id, data in tables.items()})
+
+    def append_order(self, order):
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO orders (order_id, table_id, total, items, customer, status, item_details, created_at, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                order.to_row())
+
+    def _drop_day_totals(self, db, order_id):
+        # A past day's totals are recounted after any change to its orders
+        db.execute("DELETE FROM day_totals WHERE day = (SELECT substr(created_at, 1, 10) FROM orders WHERE order_id = ?)",
+                   (order_id,))
+
+    def update_order_status(self, order_id, status, completed_at):
+        with self._connect() as db:
+            self._drop_day_totals(db, order_id)
+            db.execute("UPDATE orders SET status = ?, completed_at = ? WHERE order_id = ?", (status, completed_at, order_id))
+            if status != "Pending":
+                db.execute("DELETE FROM tickets WHERE ticket_id LIKE ?", (order_id + "-%",))
+
+    def delete_order(self, order_id):
+        with self._connect() as db:
+            self._drop_day_totals(db, order_id)
+            db.execute("DELETE FROM orders WHERE order_id = ?", (order_id,))
+            db.execute("DELETE FROM tickets WHERE ticket_id LIKE ?", (order_id + "-%",))
+
+    def sync_orders(self):
+        # Each order write is already its own committed transaction
+        pass
+
+    def query_orders(self, status=None, start_day=None, end_day=None, table_id=None):
+        clauses, args = [], []
+        if status:
+            clauses.append("status = ?")
+            args.append(status)
+        if table_id:
+            clauses.append("table_id = ?")
+            args.append(table_id)
+        if start_day:
+            clauses.append("created_at >= ?")
+            args.append(start_day)
+        if end_day:
+            clauses.append("created_at < ?")
+            args.append((date.fromisoformat(end_day) + timedelta(days=1)).isoformat())
+        return SqliteQuery(self, " AND ".join(clauses) or "1 = 1", tuple(args))
+
+    def ticket_states(self):
+        # Kitchen tickets that have left the queue at least once
+        return dict(self._connect().execute("SELECT ticket_id, state FROM tickets"))
+
+    def claim_ticket(self, ticket_id):
+        # Starts a queued ticket in one statement, so of several workers
+        # taking the same ticket exactly one succeeds
+        with self._connect() as db:
+            return db.execute(
+                "INSERT INTO tickets VALUES (?, 'in-progress') "
+                "ON CONFLICT (ticket_id) DO UPDATE SET state = 'in-progress' WHERE state = 'queued'",
+                (ticket_id,)).rowcount == 1
+
+    def save_ticket_state(self, ticket_id, state):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO tickets VALUES (?, ?)", (ticket_id, state))
+
+    def compact(self, orders):
+        pass
+
+    def start_compaction(self, compact):
+        pass
+
+    def archive_orders(self, orders, day):
+        # The rows are already on disk; memory just stops holding them
+        self.history.append(orders, day)
+
+
+class SqliteQuery:
+    # Orders matching a WHERE clause, read from the database as a sequence in
+    # cursor order: sizes, pages and bisection run as SQL, and iterating walks
+    # the cursor, so nothing is loaded before it is used
+    columns = "order_id, table_id, total, items, customer, status, item_details, created_at, completed_at"
+
+    def __init__(self, storage, where="1 = 1", args=()):
+        self.storage = storage
+        self.where = where
+        self.args = args
+
+    def _execute(self, sql, *args):
+        return self.storage._connect().execute(sql.format(where=self.where), self.args + args)
+
+    def _rows(self, sql, *args):
+        return self._execute(f"SELECT {self.columns} FROM orders WHERE {{where}}{sql}", *args)
+
+    def __len__(self):
+        return self._execute("SELECT COUNT(*) FROM orders WHERE {where}").fetchone()[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            total = len(self)
+            start, stop, step = i.indices(total)
+            if step != 1:
+                return list(self)[i]
+            if stop <= start:
+                return []
+            if total - stop < start:
+                # Recent pages are counted back from the newest order
+                rows = self._rows(" ORDER BY created_at DESC, order_id DESC LIMIT ? OFFSET ?", stop - start, total - stop)
+                return [Order.from_row(row) for row in rows][::-1]
+            rows = self._rows(" ORDER BY created_at, order_id LIMIT ? OFFSET ?", stop - start, start)
+            return [Order.from_row(row) for row in rows]
+        if i < 0:
+            i += len(self)
+        row = self._rows(" ORDER BY created_at, order_id LIMIT 1 OFFSET ?", i).fetchone() if i >= 0 else None
+        if row is None:
+            raise IndexError("order index out of range")
+        return Order.from_row(row)
+
+    def __iter__(self):
+        for row in self._rows(" ORDER BY created_at, order_id"):
+            yield Order.from_row(row)
+
+    def __reversed__(self):
+        for row in self._rows(" ORDER BY created_at DESC, order_id DESC"):
+            yield Order.from_row(row)
+
+    def bisect(self, cursor, right=False):
+        created_at, order_id = split_cursor(cursor)
+        return self._execute(
+            "SELECT COUNT(*) FROM orders WHERE {where} AND "
+            f"(created_at < ? OR (created_at = ? AND order_id {'<=' if right else '<'} ?))",
+            created_at, created_at, order_id).fetchone()[0]
+
+
+class SqliteHistory(SqliteQuery):
+    # Orders from past days, read from the database when a page or export
+    # reaches them. Writes go through SqliteStorage, so update and remove
+    # have nothing left to do.
+    # Undated orders, from before creation times were kept, sort first and
+    # belong here too
+    where = "created_at < ?"
+
+    def __init__(self, storage, day):
+        self.storage = storage
+        # Orders created before this day live here
+        self.day = day
+        self.summarize = lambda orders: summarize(orders, {})
+
+    @property
+    def args(self):
+        return (self.day,)
+
+    def __contains__(self, order):
+        return order.created_at < self.day
+
+    def get(self, order_id, day=None):
+        order = self.storage.load_order(order_id)
+        return order if order is not None and order in self else None
+
+    def find(self, status=None, table_id=None, start_day=None, end_day=None):
+        query = self.storage.query_orders(status, start_day, end_day, table_id)
+        return iter(SqliteQuery(self.storage, f"{self.where} AND {query.where}", self.args + query.args))
+
+    def day_totals(self):
+        # {day: totals} from the day_totals table. Days missing there are
+        # counted from their orders and stored; the write transaction keeps
+        # a status change in another worker from slipping in between.
+        db = self.storage._connect()
+        days = [day for day, in db.execute(
+            f"SELECT DISTINCT substr(created_at, 1, 10) FROM orders WHERE {self.where}", self.args)]
+        totals = {day: json.loads(data) for day, data in db.execute("SELECT day, totals FROM day_totals WHERE day < ?", (self.day,))}
+        missing = [day for day in days if day not in totals]
+        if missing:
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                for day in missing:
+                    if day:
+                        rows = db.execute(f"SELECT {self.columns} FROM orders WHERE created_at >= ? AND created_at < ?",
+                                          (day, (date.fromisoformat(day) + timedelta(days=1)).isoformat()))
+                    else:
+                        rows = db.execute(f"SELECT {self.columns} FROM orders WHERE created_at = ''")
+                    totals[day] = self.summarize(Order.from_row(row) for row in rows)
+                    db.execute("INSERT OR REPLACE INTO day_totals VALUES (?, ?)", (day, json.dumps(totals[day])))
+        return {day: totals[day] for day in days}
+
+    def append(self, orders, day):
+        self.day = max(self.day, day)
+
+    def update(self, order):
+        pass
+
+    def remove(self, order):
+        pass
+
+
+def open_storage(kind=None):
+    kind = kind or os.environ.get("POS_STORAGE", "csv")
+    if kind == "csv":
+        return CsvStorage()
+    if kind == "sqlite":
+        return SqliteStorage(os.environ.get("POS_DB", "pos.db"))
+    raise ValueError(f"Unknown storage backend: {kind}")
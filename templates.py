@@ -219,26 +219,7 @@ menu_template = """
     </form>
     <br>
     <div class="menu-grid">
-        {% for name, data in menu.items() %}
-        <div class="card">
-            <h3>{{ name }}</h3>
-            <p>Category: {{ data.category }}</p>
-            <p>Price: ${{ "%.2f"|format(data.price) }}</p>
-            <p>Status: {{ 'Available' if data.available else 'Unavailable' }}</p>
-            <form method="post">
-                <input type="hidden" name="action" value="update">
-                <input type="hidden" name="name" value="{{ name }}">
-                <input type="number" step="0.01" name="price" value="{{ "%.2f"|format(data.price) }}" required>
-                <label><input type="checkbox" name="available" {{ 'checked' if data.available else '' }}> Available</label>
-                <button type="submit" class="btn">Update</button>
-            </form>
-            <form method="post">
-                <input type="hidden" name="action" value="delete">
-                <input type="hidden" name="name" value="{{ name }}">
-                <button type="submit" class="btn btn-danger">Delete</button>
-            </form>
-        </div>
-        {% endfor %}
+        {{ menu_cards }}
     </div>
     <br>
     <a class="btn" href="{{ url_for('export_menu') }}">Export Menu CSV</a>
@@ -256,25 +237,7 @@ tables_template = """
     </form>
     <br>
     <div class="table-grid">
-        {% for table_id, data in tables.items() %}
-        <div class="card">
-            <h3>Table {{ table_id }}</h3>
-            <p>Seats: {{ data.seats }}</p>
-            <p>Status: {{ 'Occupied' if data.occupied else 'Free' }}</p>
-            <form method="post">
-                <input type="hidden" name="action" value="toggle">
-                <input type="hidden" name="table_id" value="{{ table_id }}">
-                <button type="submit" class="btn {{ 'btn-danger' if data.occupied else '' }}">
-                    {{ 'Free Table' if data.occupied else 'Occupy Table' }}
-                </button>
-            </form>
-            <form method="post">
-                <input type="hidden" name="action" value="delete">
-                <input type="hidden" name="table_id" value="{{ table_id }}">
-                <button type="submit" class="btn btn-danger">Delete</button>
-            </form>
-        </div>
-        {% endfor %}
+        {{ table_cards }}
     </div>
     <br>
     <a class="btn" href="{{ url_for('export_tables') }}">Export Tables CSV</a>
@@ -287,25 +250,18 @@ order_template = """
     <h2>Place Order</h2>
     <form method="post">
         <select name="table_id" required>
-            {% for table_id, data in tables.items() %}
-            <option value="{{ table_id }}">Table {{ table_id }} ({{ data.seats }} seats, {{ 'Occupied' if data.occupied else 'Free' }})</option>
-            {% endfor %}
+            {{ table_options }}
         </select>
         <input type="text" name="customer_name" placeholder="Customer Name" required>
         <textarea name="notes" placeholder="Order Notes (e.g., dietary restrictions)"></textarea>
         <h3>Order Items</h3>
         <div id="items">
             <div class="item-row">
-                <select name="items[0][name]" required>
-                    {% for name in menu.keys() %}
-                    {% if menu[name].available %}
-                    <option value="{{ name }}">{{ name }} ({{ menu[name].category }})</option>
-                    {% endif %}
-                    {% endfor %}
-                </select>
+                <input type="text" name="items[0][name]" list="menu-matches" placeholder="Search menu" autocomplete="off" required>
                 <input type="number" name="items[0][quantity]" min="1" value="1" required>
             </div>
         </div>
+        <datalist id="menu-matches"></datalist>
         <button type="button" class="btn" onclick="addItem()">Add Item</button>
         <button class="btn" type="submit">Place Order</button>
     </form>
@@ -314,19 +270,31 @@ order_template = """
         <p class="{{ 'success' if 'Order' in message else 'error' }}">{{ message }}</p>
     {% endif %}
     <script>
-    var menu = {{ menu | tojson }};
+    // Prices of the items seen in search results, for the running total
+    var prices = {};
     var itemCount = 1;
+    var searchTimer;
+    function searchMenu(query) {
+        fetch('/api/menu/search?limit=10&q=' + encodeURIComponent(query))
+            .then(response => response.json())
+            .then(matches => {
+                var list = document.getElementById('menu-matches');
+                list.innerHTML = '';
+                matches.forEach(item => {
+                    prices[item.name] = item.price;
+                    var option = document.createElement('option');
+                    option.value = item.name;
+                    option.label = item.category + ' - $' + item.price.toFixed(2);
+                    list.appendChild(option);
+                });
+                updateTotal();
+            });
+    }
     function addItem() {
         var div = document.createElement('div');
         div.className = 'item-row';
         div.innerHTML = `
-            <select name="items[${itemCount}][name]" required>
-                {% for name in menu.keys() %}
-                {% if menu[name].available %}
-                <option value="{{ name }}">{{ name }} ({{ menu[name].category }})</option>
-                {% endif %}
-                {% endfor %}
-            </select>
+            <input type="text" name="items[${itemCount}][name]" list="menu-matches" placeholder="Search menu" autocomplete="off" required>
             <input type="number" name="items[${itemCount}][quantity]" min="1" value="1" required>
         `;
         document.getElementById('items').appendChild(div);
@@ -336,14 +304,21 @@ order_template = """
     function updateTotal() {
         var total = 0;
         document.querySelectorAll('.item-row').forEach(row => {
-            var name = row.querySelector('select').value;
-            var qty = parseInt(row.querySelector('input').value) || 1;
-            total += (menu[name]?.price || 0) * qty;
+            var name = row.querySelector('input[list]').value;
+            var qty = parseInt(row.querySelector('input[type=number]').value) || 1;
+            total += (prices[name] || 0) * qty;
         });
         document.getElementById('total').innerHTML = 'Total: $' + total.toFixed(2);
     }
     document.getElementById('items').addEventListener('change', updateTotal);
     document.getElementById('items').addEventListener('input', updateTotal);
+    document.getElementById('items').addEventListener('input', event => {
+        if (event.target.list) {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => searchMenu(event.target.value), 100);
+        }
+    });
+    searchMenu('');
     updateTotal();
     </script>
 {% endblock %}
@@ -359,31 +334,35 @@ orders_template = """
             <option value="Pending">Pending</option>
             <option value="Completed">Completed</option>
         </select>
-        <input type="date" name="date">
+        <input type="date" name="date" title="From">
+        <input type="date" name="date_to" title="To">
         <button class="btn" type="submit">Filter</button>
     </form>
     <br>
+    {% set ns = namespace(total=0) %}
     <table>
-        <tr><th>Order ID</th><th>Table</th><th>Total</th><th>Items</th><th>Customer</th><th>Status</th><th>Actions</th></tr>
+        <tr><th>Order ID</th><th>Placed</th><th>Table</th><th>Total</th><th>Items</th><th>Customer</th><th>Status</th><th>Actions</th></tr>
         {% for order in orders %}
+        {% if order.status == 'Completed' %}{% set ns.total = ns.total + order.total %}{% endif %}
         <tr>
-            <td>{{ order[0] }}</td>
-            <td>{{ order[1] }}</td>
-            <td>${{ "%.2f"|format(order[2]) }}</td>
+            <td>{{ order.order_id }}</td>
+            <td>{{ order.created_at.replace('T', ' ') }}</td>
+            <td>{{ order.table_id }}</td>
+            <td>${{ "%.2f"|format(order.total) }}</td>
             <td>
-                {% for name, qty in order[3].items() %}
+                {% for name, qty in order.items.items() %}
                 {{ name }} (x{{ qty }})<br>
                 {% endfor %}
             </td>
-            <td>{{ order[4] }}</td>
-            <td>{{ order[5] }}</td>
+            <td>{{ order.customer_name }}</td>
+            <td>{{ order.status }}</td>
             <td>
                 <form method="post" style="display:inline;">
                     <input type="hidden" name="action" value="update_status">
-                    <input type="hidden" name="order_id" value="{{ order[0] }}">
+                    <input type="hidden" name="order_id" value="{{ order.order_id }}">
                     <select name="status">
-                        <option value="Pending" {{ 'selected' if order[5] == 'Pending' else '' }}>Pending</option>
-                        <option value="Completed" {{ 'selected' if order[5] == 'Completed' else '' }}>Completed</option>
+                        <option value="Pending" {{ 'selected' if order.status == 'Pending' else '' }}>Pending</option>
+                        <option value="Completed" {{ 'selected' if order.status == 'Completed' else '' }}>Completed</option>
                     </select>
                     <button type="submit" class="btn">Update</button>
                 </form>
@@ -391,8 +370,62 @@ orders_template = """
         </tr>
         {% endfor %}
     </table>
-    <p>Total Revenue: ${{ "%.2f"|format(total) }}</p>
+    <p>Total Revenue: ${{ "%.2f"|format(ns.total if total is none else total) }}</p>
+    {% if newer %}<a class="btn" href="{{ url_for('view_orders', after=newer, **filters) }}">Newer</a>{% endif %}
+    {% if older %}<a class="btn" href="{{ url_for('view_orders', before=older, **filters) }}">Older</a>{% endif %}
     <br>
-    <a class="btn" href="{{ url_for('export_orders') }}">Export Orders CSV</a>
+    <a class="btn" href="{{ url_for('export_orders', **filters) }}">Export Orders CSV</a>
+    <a class="btn" href="{{ url_for('export_orders', format='ndjson', **filters) }}">Export Orders NDJSON</a>
 {% endblock %}
-"""
\ No newline at end of file
+"""
+# Fragments rendered once per version of the data they show (see fragments.py)
+menu_cards_template = """
+        {% for name, data in menu.items() %}
+        <div class="card">
+            <h3>{{ name }}</h3>
+            <p>Category: {{ data.category }}</p>
+            <p>Price: ${{ "%.2f"|format(data.price) }}</p>
+            <p>Status: {{ 'Available' if data.available else 'Unavailable' }}</p>
+            <form method="post">
+                <input type="hidden" name="action" value="update">
+                <input type="hidden" name="name" value="{{ name }}">
+                <input type="number" step="0.01" name="price" value="{{ "%.2f"|format(data.price) }}" required>
+                <label><input type="checkbox" name="available" {{ 'checked' if data.available else '' }}> Available</label>
+                <button type="submit" class="btn">Update</button>
+            </form>
+            <form method="post">
+                <input type="hidden" name="action" value="delete">
+                <input type="hidden" name="name" value="{{ name }}">
+                <button type="submit" class="btn btn-danger">Delete</button>
+            </form>
+        </div>
+        {% endfor %}
+"""
+
+table_cards_template = """
+        {% for table_id, data in tables.items() %}
+        <div class="card">
+            <h3>Table {{ table_id }}</h3>
+            <p>Seats: {{ data.seats }}</p>
+            <p>Status: {{ 'Occupied' if data.occupied else 'Free' }}</p>
+            <form method="post">
+                <input type="hidden" name="action" value="toggle">
+                <input type="hidden" name="table_id" value="{{ table_id }}">
+                <button type="submit" class="btn {{ 'btn-danger' if data.occupied else '' }}">
+                    {{ 'Free Table' if data.occupied else 'Occupy Table' }}
+                </button>
+            </form>
+            <form method="post">
+                <input type="hidden" name="action" value="delete">
+                <input type="hidden" name="table_id" value="{{ table_id }}">
+                <button type="submit" class="btn btn-danger">Delete</button>
+            </form>
+        </div>
+        {% endfor %}
+"""
+
+table_options_template = """
+{% for table_id, data in tables.items() %}
+<option value="{{ table_id }}">Table {{ table_id }} ({{ data.seats }} seats, {{ 'Occupied' if data.occupied else 'Free' }})</option>
+{% endfor %}
+"""
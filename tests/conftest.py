@@ -0,0 +1,27 @@
+import os
+import sys
+import pytest
+
+# The application modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import journal
+from models import Order
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Every store file is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(journal, "_folded", 0)
+    monkeypatch.setattr(journal, "_pending_events", 0)
+    return tmp_path
+
+
+def make_order(n, created_at="2026-03-02T12:00:00", status="Pending"):
+    return Order(f"01KJ0000000000{n:06d}", f"T{n % 3}", 9.5 * n, {"Burger": n}, f"Guest {n}", status,
+                 {"Burger": ["Food", 9.5]}, created_at, created_at if status == "Completed" else "")
+
+
+def same(a, b):
+    return [order.to_row() for order in a] == [order.to_row() for order in b]
@@ -0,0 +1,79 @@
+import os
+from archive import OrderArchive, PartitionedArchive
+from conftest import make_order, same
+
+
+def test_records_round_trip_with_updates_and_tombstones():
+    orders = [make_order(n, f"2026-03-02T12:0{n}:00") for n in range(1, 5)]
+    archive = OrderArchive("day.orders")
+    archive.append(orders)
+    orders[0].status, orders[0].completed_at = "Completed", "2026-03-02T13:00:00"
+    archive.update(orders[0])
+    archive.remove(orders[2])
+
+    reopened = OrderArchive("day.orders")
+
+    expected = [orders[0], orders[1], orders[3]]
+    assert same(reopened, expected)
+    assert same(reopened.find("Completed"), [orders[0]])
+    assert reopened.get(orders[2].order_id) is None
+    assert reopened.get(orders[0].order_id).status == "Completed"
+    assert orders[2] not in reopened
+
+
+def test_torn_tail_is_skipped_and_cut_by_repair():
+    orders = [make_order(n) for n in range(1, 4)]
+    archive = OrderArchive("day.orders")
+    archive.append(orders[:2])
+    whole = os.path.getsize("day.orders")
+    archive.append(orders[2:])
+    # A crash part way through writing the last record
+    os.truncate("day.orders", os.path.getsize("day.orders") - 5)
+    torn = os.path.getsize("day.orders")
+
+    # Readers stop before the torn record and leave the file alone
+    assert same(OrderArchive("day.orders"), orders[:2])
+    assert os.path.getsize("day.orders") == torn
+    repaired = OrderArchive("day.orders", repair=True)
+    assert os.path.getsize("day.orders") == whole
+    repaired.append(orders[2:])
+    assert same(OrderArchive("day.orders"), orders)
+
+
+def test_partitions_round_trip_through_the_manifest():
+    undated = [make_order(n, "") for n in (1, 2)]
+    first = [make_order(n, "2026-03-01T09:00:00") for n in (3, 4)]
+    second = [make_order(n, "2026-03-02T09:00:00") for n in (5, 6)]
+    archive = PartitionedArchive()
+    archive.append(undated + first + second, "2026-03-03")
+    archive.remove(first[1])
+
+    reopened = PartitionedArchive()
+
+    assert reopened.days == ["", "2026-03-01", "2026-03-02"]
+    assert [reopened.count(day) for day in reopened.days] == [2, 1, 2]
+    # Undated orders come first, as in the SQL order
+    assert same(reopened, undated + first[:1] + second)
+    assert same(reopened[1:4], [undated[1], first[0], second[0]])
+    assert reopened.bisect(second[0].cursor()) == 3
+    assert reopened.get(undated[0].order_id) is not None
+    # A day either side of the id's own day is tried too
+    assert reopened.get(second[0].order_id, "2026-03-01").to_row() == second[0].to_row()
+    assert reopened.get(first[1].order_id, "2026-03-01") is None
+
+
+def test_manifest_recounts_a_day_file_written_after_it():
+    orders = [make_order(n, "2026-03-01T09:00:00") for n in (1, 2, 3)]
+    archive = PartitionedArchive()
+    archive.append(orders[:2], "2026-03-02")
+    path = os.path.join("orders-archive", "2026-03", "2026-03-01.orders")
+    whole = os.path.getsize(path)
+    # The last append reached the day file, but was torn and never counted
+    with open(path, mode="ab") as f:
+        f.write(b"\x10\x00")
+
+    reopened = PartitionedArchive()
+
+    assert os.path.getsize(path) == whole
+    assert reopened.count("2026-03-01") == 2
+    assert same(reopened, orders[:2])
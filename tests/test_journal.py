@@ -0,0 +1,59 @@
+import csv
+import journal
+from conftest import make_order, same
+from storage import CsvStorage
+
+
+def test_replay_applies_creates_status_changes_and_deletes():
+    storage = CsvStorage()
+    orders = [make_order(n) for n in range(1, 4)]
+    for order in orders:
+        storage.append_order(order)
+    storage.update_order_status(orders[0].order_id, "Completed", "2026-03-02T12:30:00")
+    storage.delete_order(orders[1].order_id)
+
+    loaded = CsvStorage().load_orders()
+
+    orders[0].status, orders[0].completed_at = "Completed", "2026-03-02T12:30:00"
+    assert same(loaded, [orders[0], orders[2]])
+
+
+def test_replay_over_snapshot_skips_events_already_folded():
+    storage = CsvStorage()
+    orders = [make_order(n) for n in range(1, 3)]
+    for order in orders:
+        storage.append_order(order)
+    # Saved but the journal not yet truncated, as after a crash mid-compaction
+    storage.save_orders(orders)
+
+    assert same(CsvStorage().load_orders(), orders)
+
+
+def test_compaction_folds_the_journal_into_orders_csv():
+    storage = CsvStorage()
+    orders = [make_order(n) for n in range(1, 4)]
+    for order in orders:
+        storage.append_order(order)
+    storage.compact(orders)
+
+    assert open(journal.journal_file).read() == ""
+    assert journal.pending_events() == 0
+    assert same(CsvStorage().load_orders(), orders)
+
+
+def test_compaction_keeps_events_appended_by_another_process():
+    storage = CsvStorage()
+    ours = make_order(1)
+    storage.append_order(ours)
+    # Another worker appends behind this process's back
+    theirs = make_order(2)
+    with open(journal.journal_file, mode="a", newline="") as f:
+        csv.writer(f).writerow(["create", *theirs.to_row()])
+    # Its own later appends no longer extend the prefix it holds
+    late = make_order(3)
+    storage.append_order(late)
+    storage.compact([ours])
+
+    assert "create,01KJ0000000000000001" not in open(journal.journal_file).read()
+    loaded = CsvStorage().load_orders()
+    assert [order.order_id for order in loaded] == [ours.order_id, theirs.order_id, late.order_id]
@@ -0,0 +1,33 @@
+import os
+import snapshot
+from conftest import make_order, same
+from storage import CsvStorage
+
+
+def test_snapshot_round_trips_every_field():
+    orders = [make_order(n, status="Completed" if n % 2 else "Pending") for n in range(1, 6)]
+    orders.append(make_order(6, ""))
+    CsvStorage().save_orders(orders)
+
+    loaded = snapshot.load("orders.csv")
+
+    assert same(loaded, orders)
+    assert same(CsvStorage()._read_orders_csv(), loaded)
+
+
+def test_snapshot_is_ignored_once_orders_csv_changes():
+    orders = [make_order(n) for n in range(1, 3)]
+    CsvStorage().save_orders(orders)
+    with open("orders.csv", mode="a", newline="") as f:
+        f.write("extra row\r\n")
+
+    assert snapshot.load("orders.csv") is None
+
+
+def test_missing_or_unreadable_snapshot_loads_as_none():
+    CsvStorage().save_orders([make_order(1)])
+    with open(snapshot.snapshot_path("orders.csv"), mode="r+b") as f:
+        f.truncate(10)
+    assert snapshot.load("orders.csv") is None
+    os.remove(snapshot.snapshot_path("orders.csv"))
+    assert snapshot.load("orders.csv") is None
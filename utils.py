@@ -1,67 +1,670 @@
-import csv
-import random
-import string
 import os
-import json
+import sys
+import time
+import threading
+import atexit
+from datetime import datetime, timedelta
+from itertools import chain
+from storage import open_storage
+from models import Order, id_alphabet, order_id_day, statuses as order_statuses
+from aggregates import Aggregates
+from revenue import RevenueEngine, summarize
+from order_index import OrderIndex
+from search import MenuSearch
+from kitchen import KitchenQueue, parse_stations, states as ticket_states
+from archive import Timeline, bisect_cursor
+from locks import RWLock
+from events import Subscriber, publish
+from persistence import committer, writer, changes
+from feed import feed
+from exports import order_records
 
-menu_file = "menu.csv"
-orders_file = "orders.csv"
-tables_file = "tables.csv"
+storage = open_storage()
+# POS_SHARED=1 runs several worker processes against one shared store
+shared = os.environ.get("POS_SHARED") == "1"
+subscriber = None
+_rollover = None
+aggregates = Aggregates()
+revenue_engine = RevenueEngine()
+order_index = OrderIndex()
+# Kitchen stations by menu category, e.g. POS_STATIONS="Drinks=bar,Dessert=pastry";
+# anything not listed goes to the line
+kitchen = KitchenQueue(parse_stations(os.environ.get("POS_STATIONS", "Drinks=bar")), "line")
 
 menu = {}
+menu_search = MenuSearch()
+# Orders created today (and any without a creation time) stay in memory;
+# earlier ones are read from the storage's history only when needed
 orders = []
+order_history = storage.history
+all_orders = Timeline(order_history, orders)
+# Past days keep their revenue as per-day totals, split with this menu
+order_history.summarize = lambda past: summarize(past, menu)
 tables = {}
 
+# Take these in this order (menu, orders, tables) when holding more than one
+menu_lock = RWLock()
+orders_lock = RWLock()
+tables_lock = RWLock()
+
 def load_menu():
-    global menu
-    if os.path.exists(menu_file):
-        with open(menu_file, mode="r", newline="") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if row:
-                    menu[row[0]] = {
-                        "category": row[1],
-                        "price": float(row[2]),
-                        "available": row[3] == "True"
-                    }
+    with menu_lock.write():
+        menu.clear()
+        menu.update(storage.load_menu())
+        changes.loaded("menu", "menu")
+        menu_search.rebuild(menu)
 
 def load_orders():
-    global orders
-    orders = []
-    if os.path.exists(orders_file):
-        with open(orders_file, mode="r", newline="") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if row:
-                    items = json.loads(row[3]) if row[3] else {}
-                    orders.append([row[0], row[1], float(row[2]), items, row[4], row[5]])
+    with orders_lock.write():
+        orders[:] = storage.load_orders()
+        # The snapshot target stays dirty so the next compaction folds in
+        # whatever was replayed from the journal
+        changes.loaded("orders", "journal")
+        # Keep the list in cursor order so pages can be found by bisection
+        orders.sort(key=Order.cursor)
+        order_index.rebuild(orders)
+        # A pending order stays kitchen work whatever day it was placed
+        kitchen.rebuild(chain(order_history.find("Pending"), order_index.find("Pending")), menu)
+        if shared:
+            for ticket_id, state in storage.ticket_states().items():
+                kitchen.set_state(ticket_id, state)
 
 def load_tables():
-    global tables
-    if os.path.exists(tables_file):
-        with open(tables_file, mode="r", newline="") as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if row:
-                    tables[row[0]] = {"seats": int(row[1]), "occupied": row[2] == "True"}
+    with tables_lock.write():
+        tables.clear()
+        tables.update(storage.load_tables())
+        changes.loaded("tables", "tables")
 
-def save_menu():
-    with open(menu_file, mode="w", newline="") as f:
-        writer = csv.writer(f)
-        for name, data in menu.items():
-            writer.writerow([name, data["category"], data["price"], data["available"]])
+# Once init_store() has started the write-behind thread, saves only mark a
+# collection dirty and return; the thread writes it within a flush interval.
+# Before that (scripts, one-off tools) saves go through the group committer
+# and wait for the disk. Either way each write snapshots the latest state,
+# and the snapshots take read locks, so never save while holding a write lock.
+# A save is dropped when its collection hasn't changed since the last write.
+def _persist(key, action):
+    if writer.running():
+        writer.mark(key, action)
+    else:
+        committer.commit(key, action)
 
-def save_orders():
-    with open(orders_file, mode="w", newline="") as f:
-        writer = csv.writer(f)
-        for order in orders:
-            writer.writerow([order[0], order[1], order[2], json.dumps(order[3]), order[4], order[5]])
+def _save(target, collection, write):
+    def action():
+        if changes.needs_write(target, collection):
+            write()
+    if changes.needs_write(target, collection):
+        _persist(target, action)
+
+def save_menu():
+    def write():
+        with menu_lock.read():
+            version = changes.version("menu")
+            snapshot = menu_snapshot()
+        storage.save_menu(snapshot)
+        changes.wrote("menu", version)
+        _notify("menu")
+    _save("menu", "menu", write)
 
 def save_tables():
-    with open(tables_file, mode="w", newline="") as f:
-        writer = csv.writer(f)
-        for table_id, data in tables.items():
-            writer.writerow([table_id, data["seats"], data["occupied"]])
+    def write():
+        with tables_lock.read():
+            version = changes.version("tables")
+            snapshot = tables_snapshot()
+        storage.save_tables(snapshot)
+        changes.wrote("tables", version)
+        _notify("tables")
+    _save("tables", "tables", write)
+
+def sync_orders():
+    def write():
+        # Changes are journalled under the write lock, so everything up to
+        # this version is in the journal before the fsync
+        with orders_lock.read():
+            version = changes.version("orders")
+        storage.sync_orders()
+        changes.wrote("journal", version)
+    _save("journal", "orders", write)
+
+def flush_writes():
+    writer.flush()
+
+def write_stats():
+    return changes.stats()
+
+def search_menu(query, limit=10):
+    # Typeahead for the order page: available items only, best match first
+    with menu_lock.read():
+        return [{"name": name, **menu[name]} for name in menu_search.search(query, limit)]
+
+def menu_snapshot():
+    with menu_lock.read():
+        return {name: dict(data) for name, data in menu.items()}
+
+def tables_snapshot():
+    with tables_lock.read():
+        return {table_id: dict(data) for table_id, data in tables.items()}
+
+# The _edit/_delete menu helpers change memory only; callers hold menu_lock
+# and save afterwards
+def _edit_menu_item(name, category=None, price=None, available=None):
+    # A new item needs a category and a price; an existing one only changes
+    # the fields given. Returns False for an unknown item without them.
+    current = menu.get(name)
+    if current is None:
+        if category is None or price is None:
+            return False
+        item = {"category": category, "price": price, "available": True if available is None else available}
+    else:
+        item = dict(current)
+        for key, value in (("category", category), ("price", price), ("available", available)):
+            if value is not None:
+                item[key] = value
+    if item != current:
+        menu[name] = item
+        changes.touch("menu")
+        menu_search.add(name, item)
+    return True
+
+def _delete_menu_item(name):
+    if menu.pop(name, None) is None:
+        return False
+    changes.touch("menu")
+    menu_search.remove(name)
+    return True
+
+def add_menu_item(name, category, price, available):
+    with menu_lock.write():
+        _edit_menu_item(name, category, price, available)
+    save_menu()
+
+def update_menu_item(name, price, available):
+    with menu_lock.write():
+        if not _edit_menu_item(name, price=price, available=available):
+            return False
+    save_menu()
+    return True
+
+def delete_menu_item(name):
+    with menu_lock.write():
+        if not _delete_menu_item(name):
+            return False
+    save_menu()
+    return True
+
+def edit_menu_items(edits):
+    # Many edits under one lock and one save. Each edit is a dict with a
+    # "name" and either "delete" or the fields to set; returns one bool each.
+    with menu_lock.write():
+        results = [
+            _delete_menu_item(edit["name"]) if edit.get("delete") else
+            _edit_menu_item(edit["name"], edit.get("category"), edit.get("price"), edit.get("available"))
+            for edit in edits
+        ]
+    save_menu()
+    return results
+
+# The _insert/_update/_remove helpers change memory only; callers hold
+# orders_lock and handle storage and notifications
+def _insert_order(order):
+    cursor = order.cursor()
+    if not orders or orders[-1].cursor() <= cursor:
+        orders.append(order)
+    else:
+        orders.insert(bisect_cursor(orders, cursor, right=True), order)
+    order_index.add(order)
+    revenue_engine.add(order, menu)
+    aggregates.order_status_changed(order, None, menu)
+    changes.touch("orders")
+    if order.status == "Pending":
+        _tickets_added(kitchen.add(order, menu))
+
+def _update_order_status(order, status, completed_at):
+    old_status = order.status
+    order.status = sys.intern(status)
+    order.completed_at = completed_at
+    if order_index.get(order.order_id) is order:
+        order_index.status_changed(order, old_status)
+        revenue_engine.set_status(order.order_id, status)
+    else:
+        order_history.update(order)
+        revenue_engine.adjust_day(order, menu, -1, old_status)
+        revenue_engine.adjust_day(order, menu, 1)
+    aggregates.order_status_changed(order, old_status, menu)
+    changes.touch("orders")
+    # Only pending orders are kitchen work; reopening one queues it again
+    if status == "Pending":
+        _tickets_added(kitchen.add(order, menu))
+    else:
+        _tickets_removed(kitchen.remove(order.order_id))
+
+def _completed_at(order, status):
+    if status != "Completed":
+        return ""
+    return order.completed_at if order.status == "Completed" else timestamp()
+
+def _remove_order(order):
+    if order_index.get(order.order_id) is order:
+        orders.remove(order)
+        order_index.remove(order)
+        revenue_engine.remove(order.order_id)
+    else:
+        order_history.remove(order)
+        revenue_engine.adjust_day(order, menu, -1)
+    aggregates.order_removed(order, menu)
+    changes.touch("orders")
+    _tickets_removed(kitchen.remove(order.order_id))
+
+def delete_order(order_id):
+    # Looked up under the lock, so of two concurrent deletes only one
+    # finds the order; returns the removed order, or None
+    with orders_lock.write():
+        order = get_order(order_id)
+        if order is None:
+            return None
+        _remove_order(order)
+        storage.delete_order(order_id)
+    sync_orders()
+    _notify("orders", order_id)
+    feed.emit("order-deleted", {"order_id": order_id})
+    return order
+
+def submit_order(table_id, customer_name, quantities):
+    # Validate, record the order and occupy its table as one step so two
+    # waiters can't interleave between the checks and the writes
+    with menu_lock.read(), orders_lock.write(), tables_lock.write():
+        items = {name: qty for name, qty in quantities.items() if name in menu and menu[name]["available"]}
+        if not items:
+            return None, "Error: No valid items selected."
+        if table_id not in tables:
+            return None, "Error: Invalid table ID."
+        total = sum(menu[name]["price"] * qty for name, qty in items.items())
+        item_details = {name: [menu[name]["category"], menu[name]["price"]] for name in items}
+        order = Order(generate_order_id(), table_id, total, items, customer_name, "Pending", item_details, timestamp())
+        _insert_order(order)
+        storage.append_order(order)
+        if not tables[table_id]["occupied"]:
+            set_table_occupied(table_id, True)
+    # Queue the writes only after the locks are released
+    sync_orders()
+    _notify("orders", order.order_id)
+    _order_event("order-created", order)
+    save_tables()
+    return order, None
+
+def _change_order_status(order_id, status):
+    # Callers hold orders_lock and tables_lock. Completing an order frees
+    # its table in the same step.
+    order = get_order(order_id)
+    if order is None:
+        return None
+    completed_at = _completed_at(order, status)
+    _update_order_status(order, status, completed_at)
+    storage.update_order_status(order.order_id, status, completed_at)
+    if status == "Completed" and order.table_id in tables:
+        set_table_occupied(order.table_id, False)
+    return order
+
+def change_order_status(order_id, status):
+    return change_order_statuses([(order_id, status)])[0]
+
+def change_order_statuses(updates):
+    # Many (order_id, status) changes under one lock, then one journal sync
+    # and one table save; returns the orders, None for unknown ids
+    for _, status in updates:
+        if status not in order_statuses:
+            raise ValueError(f"Unknown order status: {status}")
+    with orders_lock.write(), tables_lock.write():
+        updated = [_change_order_status(order_id, status) for order_id, status in updates]
+    sync_orders()
+    for order in updated:
+        if order is not None:
+            _notify("orders", order.order_id)
+            _order_event("order-status-changed", order)
+    save_tables()
+    return updated
+
+def add_table(table_id, seats):
+    with tables_lock.write():
+        if table_id in tables:
+            aggregates.table_changed(tables[table_id]["occupied"], False)
+        tables[table_id] = {"seats": seats, "occupied": False}
+        changes.touch("tables")
+
+def delete_table(table_id):
+    with tables_lock.write():
+        if table_id not in tables:
+            return False
+        aggregates.table_changed(tables.pop(table_id)["occupied"], False)
+        changes.touch("tables")
+        return True
+
+def update_table(table_id, seats=None, occupied=None):
+    with tables_lock.write():
+        if table_id not in tables:
+            return False
+        if seats is not None and tables[table_id]["seats"] != seats:
+            tables[table_id]["seats"] = seats
+            changes.touch("tables")
+        if occupied is not None:
+            set_table_occupied(table_id, occupied)
+        return True
+
+def edit_tables(edits):
+    # Same shape as edit_menu_items, keyed on "table_id": an unknown table
+    # with "seats" is added. Callers save_tables() as for the single edits.
+    with tables_lock.write():
+        results = []
+        for edit in edits:
+            table_id = edit["table_id"]
+            if edit.get("delete"):
+                results.append(delete_table(table_id))
+            elif table_id not in tables and edit.get("seats") is not None:
+                add_table(table_id, edit["seats"])
+                results.append(update_table(table_id, occupied=edit.get("occupied")))
+            else:
+                results.append(update_table(table_id, edit.get("seats"), edit.get("occupied")))
+        return results
+
+def set_table_occupied(table_id, occupied):
+    with tables_lock.write():
+        if tables[table_id]["occupied"] == occupied:
+            return
+        aggregates.table_changed(tables[table_id]["occupied"], occupied)
+        tables[table_id]["occupied"] = occupied
+        changes.touch("tables")
+        feed.emit("table-toggled", {"table_id": table_id, "occupied": occupied})
+
+def toggle_table(table_id):
+    with tables_lock.write():
+        if table_id not in tables:
+            return False
+        set_table_occupied(table_id, not tables[table_id]["occupied"])
+        return True
+
+def rebuild_aggregates():
+    # Exclusive on orders: the engine is emptied and refilled in place, so a
+    # concurrent rebuild or revenue report must not see it half way
+    with menu_lock.read(), orders_lock.write(), tables_lock.read():
+        revenue_engine.rebuild(orders, menu, order_history.day_totals())
+        aggregates.rebuild(menu, all_orders, tables, revenue_engine.breakdown(), revenue_engine.count("Completed"))
+
+def revenue_report(status="Completed", start_day=None, end_day=None):
+    with orders_lock.read():
+        return revenue_engine.breakdown(status, start_day, end_day)
+
+def check_aggregates():
+    with menu_lock.read(), orders_lock.read(), tables_lock.read():
+        return aggregates.verify(menu, all_orders, tables)
+
+def get_order(order_id):
+    order = order_index.get(order_id)
+    if order is None:
+        order = order_history.get(order_id, order_id_day(order_id))
+    return order
+
+def query_orders(status=None, start_day=None, end_day=None, table_id=None):
+    # Without a table filter the result is a lazy view in cursor order: pages
+    # and exports read only the orders they reach
+    if storage.indexed_queries:
+        return storage.query_orders(status, start_day, end_day, table_id)
+    with orders_lock.read():
+        if not table_id:
+            return Timeline(order_history.query(status, start_day, end_day),
+                            order_index.find(status, None, start_day, end_day))
+        # A table filter is read into a list
+        return list(order_history.find(status, table_id, start_day, end_day)) + \
+            order_index.find(status, table_id, start_day, end_day)
+
+def filter_orders(status=None, date=None, date_to=None):
+    # A single date means that day; date_to alone means everything up to it
+    if not (status or date or date_to):
+        return all_orders
+    return query_orders(status, date, date_to or date)
+
+def filtered_revenue(status=None, date=None, date_to=None):
+    # Completed revenue of what filter_orders() returns, from the revenue
+    # engine rather than by reading every matching order
+    if status and status != "Completed":
+        return 0.0
+    return sum(revenue_report("Completed", date, date_to or date).values())
+
+def _bisect_cursor(results, cursor, right=False):
+    if hasattr(results, "bisect"):
+        return results.bisect(cursor, right)
+    return bisect_cursor(results, cursor, right)
+
+def page_orders(results, before=None, after=None, size=50):
+    # results are in cursor order; pages run newest first
+    with orders_lock.read():
+        if before:
+            end = _bisect_cursor(results, before)
+            start = max(end - size, 0)
+        elif after:
+            start = _bisect_cursor(results, after, right=True)
+            end = min(start + size, len(results))
+        else:
+            end = len(results)
+            start = max(end - size, 0)
+        rows = results[start:end]
+        older = rows[0].cursor() if rows and start > 0 else None
+        newer = rows[-1].cursor() if rows and end < len(results) else None
+    return rows[::-1], older, newer
+
+def init_store():
+    global subscriber
+    if shared:
+        if not storage.indexed_queries:
+            raise RuntimeError("POS_SHARED=1 needs a storage backend every worker can share (POS_STORAGE=sqlite)")
+        # Subscribe before loading so nothing written in between is missed
+        subscriber = Subscriber()
+    load_menu()
+    load_orders()
+    load_tables()
+    roll_history()
+    rebuild_aggregates()
+    start_rollover()
+    start_writer()
+    start_compaction()
+
+def _notify(collection, key=""):
+    if shared:
+        publish(collection, key)
+
+def _order_event(kind, order):
+    # Live displays get the same record as the JSON API
+    feed.emit(kind, next(order_records([order])))
+
+def _tickets_added(added):
+    for ticket in added:
+        feed.emit("ticket-changed", ticket.record())
+
+def _tickets_removed(removed):
+    for ticket in removed:
+        feed.emit("ticket-removed", {"ticket_id": ticket.ticket_id, "station": ticket.station})
+
+def _ticket_changed(ticket):
+    # Other workers apply the same state change from the notice
+    _notify("tickets", f"{ticket.ticket_id} {ticket.state}")
+    feed.emit("ticket-changed", ticket.record())
+
+def next_ticket(station):
+    # With several workers the shared store decides who starts a ticket;
+    # one another worker already took is brought up to date and skipped
+    while True:
+        ticket = kitchen.next(station)
+        if ticket is None or not shared or storage.claim_ticket(ticket.ticket_id):
+            break
+        kitchen.set_state(ticket.ticket_id, storage.ticket_states().get(ticket.ticket_id, "in-progress"))
+    if ticket is not None:
+        _ticket_changed(ticket)
+    return ticket
+
+def set_ticket_state(ticket_id, state):
+    if state not in ticket_states:
+        raise ValueError(f"Unknown ticket state: {state}")
+    ticket = kitchen.set_state(ticket_id, state)
+    if ticket is not None:
+        if shared:
+            storage.save_ticket_state(ticket_id, state)
+        _ticket_changed(ticket)
+    return ticket
+
+def roll_history(day=None):
+    # Orders from before `day` (default today) leave memory for the history
+    day = day or timestamp()[:10]
+    if day <= order_history.day:
+        return
+    with orders_lock.write():
+        if day <= order_history.day:
+            return
+        # Undated orders, from before creation times were kept, sort first
+        # and go on the first roll after they are loaded
+        cut = bisect_cursor(orders, day)
+        past = orders[:cut]
+        storage.archive_orders(past, day)
+        del orders[:cut]
+        # Their tickets stay queued: the kitchen works across midnight
+        for order in past:
+            order_index.remove(order)
+        if not past:
+            return
+        changes.touch("orders")
+    # Their revenue moves from per-order lines into the day's totals
+    rebuild_aggregates()
+    # Shrink orders.csv and the journal down to the new day
+    compact_orders()
+
+def start_rollover():
+    # End-of-day job, so the move happens at midnight even with no traffic
+    global _rollover
+    if _rollover is not None:
+        return
+
+    def run():
+        while True:
+            now = datetime.now()
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            time.sleep((midnight - now).total_seconds() + 1)
+            roll_history()
+
+    _rollover = threading.Thread(target=run, name="day-rollover", daemon=True)
+    _rollover.start()
+
+def sync_changes():
+    # Pull in writes made by other worker processes; one stat() when idle.
+    # Also the point where a new day moves yesterday's orders out of memory.
+    roll_history()
+    if subscriber is None:
+        return
+    notices = subscriber.poll()
+    if notices is None:
+        load_menu()
+        load_orders()
+        load_tables()
+        rebuild_aggregates()
+        # Which changes happened is unknown, so live displays reload too
+        feed.emit("reset", {})
+        return
+    changed = {collection for collection, key in notices if collection != "orders"}
+    if "menu" in changed:
+        load_menu()
+    if "tables" in changed:
+        with tables_lock.read():
+            occupied = {table_id: data["occupied"] for table_id, data in tables.items()}
+        load_tables()
+        with tables_lock.read():
+            aggregates.recount_tables(tables)
+            toggled = [(table_id, data["occupied"]) for table_id, data in tables.items()
+                       if table_id in occupied and occupied[table_id] != data["occupied"]]
+        for table_id, now in toggled:
+            feed.emit("table-toggled", {"table_id": table_id, "occupied": now})
+    stale = False
+    for order_id in dict.fromkeys(key for collection, key in notices if collection == "orders"):
+        fresh = storage.load_order(order_id)
+        with orders_lock.write():
+            current = order_index.get(order_id)
+            if current is None and (fresh is None or fresh in order_history):
+                # Possibly a past day's order: its previous state is not in
+                # memory, so the totals are recounted instead of adjusted
+                stale = True
+                changes.touch("orders")
+                kind = "order-status-changed"
+                if fresh is not None and fresh.status == "Pending":
+                    _tickets_added(kitchen.add(fresh, menu))
+                else:
+                    _tickets_removed(kitchen.remove(order_id))
+            elif fresh is None:
+                _remove_order(current)
+            elif current is None:
+                _insert_order(fresh)
+                kind = "order-created"
+            else:
+                _update_order_status(current, fresh.status, fresh.completed_at)
+                kind = "order-status-changed"
+        # Replay the other worker's change to this worker's live displays
+        if fresh is None:
+            feed.emit("order-deleted", {"order_id": order_id})
+        else:
+            _order_event(kind, fresh)
+    if stale:
+        rebuild_aggregates()
+    # After the orders, so tickets of orders placed elsewhere exist by now
+    for collection, key in notices:
+        if collection == "tickets":
+            ticket_id, state = key.rsplit(" ", 1)
+            ticket = kitchen.set_state(ticket_id, state)
+            if ticket is not None:
+                feed.emit("ticket-changed", ticket.record())
+
+def compact_orders():
+    if not changes.needs_write("orders", "orders"):
+        return
+    with orders_lock.read():
+        version = changes.version("orders")
+        storage.compact(orders)
+    changes.wrote("orders", version)
+
+def start_writer():
+    # Other workers only see a change once it is saved and announced, and
+    # they save whole collections, so a deferred save could be overwritten
+    # by a worker that hasn't seen it yet. Shared mode keeps saves synchronous.
+    if shared:
+        return
+    writer.start()
+    atexit.register(writer.stop)
+
+def start_compaction():
+    storage.start_compaction(compact_orders)
+    atexit.register(compact_orders)
+
+def timestamp():
+    return datetime.now().isoformat(timespec="seconds")
+
+# Order ids are laid out in models.py
+_id_lock = threading.Lock()
+_id_state = {"pid": None, "node": "", "ms": 0, "counter": 0}
+
+def _encode_id(value, width):
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 32)
+        chars.append(id_alphabet[digit])
+    return "".join(reversed(chars))
 
 def generate_order_id():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
\ No newline at end of file
+    with _id_lock:
+        state = _id_state
+        if state["pid"] != os.getpid():
+            # Fresh node after a fork so worker processes never share a sequence
+            state["pid"] = os.getpid()
+            state["node"] = _encode_id(int.from_bytes(os.urandom(4), "big") >> 2, 6)
+            state["counter"] = 0
+        ms = max(int(time.time() * 1000), state["ms"])
+        if ms == state["ms"]:
+            state["counter"] += 1
+            if state["counter"] >= 32 ** 4:
+                ms += 1
+                state["counter"] = 0
+        else:
+            state["counter"] = 0
+        state["ms"] = ms
+        return _encode_id(ms, 10) + state["node"] + _encode_id(state["counter"], 4)